@@ -0,0 +1,327 @@
+"""
+Backup scheduling for the expense tracker.
+Automatic backups are taken at most once per backup_frequency and copied on
+a background thread, so recording an expense never waits for a file copy.
+Backups are full copies, or incremental ones kept in a ChunkStore. Every
+backup is recorded in an append-only catalog, so listing, pruning and
+restoring never scan the backup directory.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional
+
+from chunks import ChunkStore, read_lines
+from compression import open_reader, open_writer
+from locking import LedgerLock
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# strftime formats naming the period a backup falls in, per retention tier
+RETENTION_PERIODS = {
+    "hourly": "%Y-%m-%d %H",
+    "daily": "%Y-%m-%d",
+    "weekly": "%G-W%V",
+    "monthly": "%Y-%m",
+}
+DEFAULT_RETENTION = {"hourly": 24, "daily": 7, "weekly": 4, "monthly": 12}
+
+# The catalog is rewritten once it holds this many removal records and more
+# of them than live backups
+CATALOG_COMPACT_MIN = 100
+
+
+@dataclass
+class CapturedFile:
+    """An open source file and the prefix of it that belongs in a backup."""
+    source: BinaryIO
+    size: int
+    target: Path
+    name: str  # the data file the backup restores
+
+
+def capture(path: Path, target: Path, name: Optional[str] = None) -> Optional[CapturedFile]:
+    """Pin the current contents of a file for copying later.
+
+    The open handle keeps the captured inode alive across atomic renames, and
+    rows appended after the capture lie beyond the recorded size, so the copy
+    is consistent even while the ledger keeps changing. Returns None if the
+    file does not exist. name defaults to the file's own name.
+    """
+    try:
+        source = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    return CapturedFile(source, os.fstat(source.fileno()).st_size, target, name or path.name)
+
+
+def copy_captured(files: List[CapturedFile], compression: str = "none") -> List[Dict]:
+    """Copy captured files into place through temp files, closing their sources.
+
+    The copies are streamed through the given compression. Returns the
+    name, size and SHA-256 of the uncompressed contents of every file.
+    """
+    copied = []
+    try:
+        for captured in files:
+            digest = hashlib.sha256()
+            temp_path = captured.target.with_name(captured.target.name + '.tmp')
+            with open_writer(temp_path, compression) as target:
+                captured.source.seek(0)
+                remaining = captured.size
+                while remaining > 0:
+                    block = captured.source.read(min(remaining, 1 << 20))
+                    if not block:
+                        break
+                    digest.update(block)
+                    target.write(block)
+                    remaining -= len(block)
+            os.replace(temp_path, captured.target)
+            copied.append({"name": captured.name, "size": captured.size - remaining,
+                           "sha256": digest.hexdigest()})
+    finally:
+        for captured in files:
+            captured.source.close()
+    return copied
+
+
+def store_captured(store: ChunkStore, name: str, files: List[CapturedFile],
+                   compression: str = "none") -> List[Dict]:
+    """Record captured files as an incremental backup, closing their sources."""
+    try:
+        return store.backup(name, {
+            captured.name: read_lines(captured.source, captured.size) for captured in files
+        }, compression)
+    finally:
+        for captured in files:
+            captured.source.close()
+
+
+def file_digest(path: Path, name: str) -> Dict:
+    """Return the name, size and SHA-256 of a backup file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+            size += len(block)
+    return {"name": name, "size": size, "sha256": digest.hexdigest()}
+
+
+def restore_file(source: Path, target: Path, sha256: Optional[str] = None) -> None:
+    """Copy a backup file over a data file through a synced temp file.
+
+    Compressed backups are decompressed on the way. With sha256 the copy is
+    verified before it replaces the data file, and ValueError is raised if
+    it does not match.
+    """
+    digest = hashlib.sha256()
+    temp_path = target.with_name(target.name + '.restore')
+    with open_reader(source) as reader, open(temp_path, 'wb') as writer:
+        for block in iter(lambda: reader.read(1 << 20), b''):
+            digest.update(block)
+            writer.write(block)
+        writer.flush()
+        os.fsync(writer.fileno())
+    if sha256 is not None and digest.hexdigest() != sha256:
+        temp_path.unlink()
+        raise ValueError(f"{source} does not match the checksum recorded when it was taken")
+    os.replace(temp_path, target)
+
+
+@dataclass
+class BackupRecord:
+    """A catalog entry: one restore point and the files it holds."""
+    name: str
+    kind: str  # "full", "incremental" or "sqlite"
+    created: float
+    files: List[Dict] = field(default_factory=list)  # name, size and sha256 per data file
+    compression: str = "none"
+
+    @property
+    def size(self) -> int:
+        """Total size of the backed-up files in bytes."""
+        return sum(entry["size"] for entry in self.files)
+
+
+class BackupCatalog:
+    """Append-only record of the backups that exist.
+
+    Each line adds or removes one backup, so recording a backup writes one
+    line instead of rewriting or listing anything. Removal records are
+    compacted away once they outnumber the live backups. Writes hold a file
+    lock, so a compaction cannot drop lines another session appended.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: Dict[str, BackupRecord] = {}
+        self._removed = 0
+        self._lock = threading.Lock()
+        self._file_lock = LedgerLock(path.with_suffix('.lock'))
+
+    @property
+    def exists(self) -> bool:
+        """Whether the catalog file has been written."""
+        return self.path.exists()
+
+    def load(self) -> None:
+        """Read the catalog, skipping a line cut short by an interrupted write."""
+        self.records = {}
+        self._removed = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.pop("op", None) == "remove":
+                self.records.pop(entry["name"], None)
+                self._removed += 1
+            else:
+                self.records[entry["name"]] = BackupRecord(**entry)
+
+    def _append(self, entries: Iterable[Dict]) -> None:
+        """Append catalog lines."""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+    def _rewrite(self) -> None:
+        """Replace the catalog with one line per live backup."""
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            for record in self.records.values():
+                file.write(json.dumps({"op": "add", **asdict(record)}) + '\n')
+        os.replace(temp_path, self.path)
+        self._removed = 0
+
+    def add(self, record: BackupRecord) -> None:
+        """Record a new backup."""
+        with self._lock, self._file_lock:
+            self._append([{"op": "add", **asdict(record)}])
+            self.records[record.name] = record
+
+    def add_many(self, records: Iterable[BackupRecord]) -> None:
+        """Record several existing backups, creating the catalog."""
+        with self._lock, self._file_lock:
+            for record in records:
+                self.records[record.name] = record
+            self._rewrite()
+
+    def remove(self, names: Iterable[str]) -> None:
+        """Forget backups."""
+        names = [name for name in names if name in self.records]
+        if not names:
+            return
+        with self._lock, self._file_lock:
+            self._append({"op": "remove", "name": name} for name in names)
+            for name in names:
+                del self.records[name]
+            self._removed += len(names)
+            if self._removed >= CATALOG_COMPACT_MIN and self._removed > len(self.records):
+                # Compact what is on disk, which may hold backups other sessions recorded
+                self.load()
+                self._rewrite()
+
+    def backups(self, kinds: Iterable[str]) -> List[BackupRecord]:
+        """Return the backups of the given kinds, oldest first."""
+        kinds = set(kinds)
+        with self._lock:
+            records = [record for record in self.records.values() if record.kind in kinds]
+        return sorted(records, key=lambda record: (record.created, record.name))
+
+    def newest(self) -> Optional[float]:
+        """Return when the most recent backup was taken, if any."""
+        with self._lock:
+            return max((record.created for record in self.records.values()), default=None)
+
+
+def expired_backups(records: List[BackupRecord], keep_last: int,
+                    retention: Dict[str, int]) -> List[BackupRecord]:
+    """Return the backups a generational retention policy no longer keeps.
+
+    The keep_last most recent backups are always kept. Each retention tier
+    then keeps the newest backup of each of its most recent periods, e.g.
+    {"daily": 7} keeps the last backup of each of the last seven days that
+    have one.
+    """
+    newest_first = sorted(records, key=lambda record: record.created, reverse=True)
+    kept = {record.name for record in newest_first[:keep_last]}
+    for tier, count in retention.items():
+        period_format = RETENTION_PERIODS.get(tier)
+        if period_format is None:
+            continue
+        periods = set()
+        for record in newest_first:
+            if len(periods) >= count:
+                break
+            period = datetime.fromtimestamp(record.created).strftime(period_format)
+            if period not in periods:
+                periods.add(period)
+                kept.add(record.name)
+    return [record for record in newest_first if record.name not in kept]
+
+
+class BackupScheduler:
+    """Coalesces backup requests and runs due backups on a worker thread.
+
+    Changes only mark a backup as pending. A pending backup runs once
+    backup_frequency days have passed since the last one; a frequency of 0
+    backs up after every change, still coalescing the changes made while a
+    copy is in progress.
+    """
+
+    def __init__(self, frequency_days: float, last_backup: Optional[float] = None):
+        self.interval = frequency_days * SECONDS_PER_DAY
+        self.last_backup = last_backup
+        self.pending = False
+        self.error: Optional[Exception] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def changed(self) -> None:
+        """Record that the ledger changed since the last backup."""
+        self.pending = True
+
+    @property
+    def running(self) -> bool:
+        """Whether a backup is being copied right now."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def due(self) -> bool:
+        """Whether a pending backup should be taken now."""
+        if not self.pending or self.running:
+            return False
+        return self.last_backup is None or time.time() - self.last_backup >= self.interval
+
+    def start(self, job: Callable[[], None], background: bool = True) -> None:
+        """Run a backup job, on a worker thread unless background is False."""
+        self.pending = False
+        self.last_backup = time.time()
+        if not background:
+            self._run(job)
+            return
+        self._thread = threading.Thread(target=self._run, args=(job,), name="expense-backup")
+        self._thread.start()
+
+    def _run(self, job: Callable[[], None]) -> None:
+        """Run a job, keeping its error for the caller to report."""
+        try:
+            job()
+        except OSError as error:
+            self.error = error
+
+    def wait(self) -> None:
+        """Block until a running backup has finished."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,222 @@
+"""
+Deduplicated incremental backups for the expense tracker.
+Files are cut into content-defined chunks on line boundaries and each chunk
+is stored once under its hash; a backup is a small manifest listing the
+chunks of every file it covers. A reference count per chunk lets a backup be
+deleted without reading the manifests of the backups that remain.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set
+
+from compression import compress, decompress
+from locking import LedgerLock
+from storage import remove_file
+
+# A chunk ends after a line whose CRC-32 has these bits clear, giving chunks
+# of about 1024 lines that only change where the ledger itself changed
+BOUNDARY_MASK = 0x3FF
+CHUNK_MIN_BYTES = 8 << 10
+CHUNK_MAX_BYTES = 1 << 20
+READ_BLOCK_BYTES = 1 << 20
+
+
+def read_lines(source: BinaryIO, size: int) -> Iterator[bytes]:
+    """Yield the lines within the first size bytes of a file, newlines included."""
+    source.seek(0)
+    remaining = size
+    pending = b''
+    while remaining > 0:
+        block = source.read(min(remaining, READ_BLOCK_BYTES))
+        if not block:
+            break
+        remaining -= len(block)
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def split_chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """Group lines into content-defined chunks.
+
+    Boundaries depend only on the lines themselves, so inserting, editing or
+    appending rows changes the chunks around the change and no others.
+    """
+    chunk: List[bytes] = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_MAX_BYTES or (size >= CHUNK_MIN_BYTES and zlib.crc32(line) & BOUNDARY_MASK == 0):
+            yield b''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+class ChunkStore:
+    """Content-addressed chunks plus one manifest per backup.
+
+    Chunks live in chunks/<first two hex digits>/<sha256> and manifests in
+    manifests/<backup name>.json under the store's directory. chunks/refs.json
+    counts the backups using each chunk; it is only changed while holding
+    chunks.lock, so processes backing up and pruning never delete a chunk
+    another one is about to reference.
+    """
+
+    def __init__(self, root: Path):
+        self.chunk_dir = root / "chunks"
+        self.manifest_dir = root / "manifests"
+        self.refs_path = self.chunk_dir / "refs.json"
+        self.lock = LedgerLock(root / "chunks.lock")
+
+    def _chunk_path(self, digest: str) -> Path:
+        """Return where a chunk with the given hash is stored."""
+        return self.chunk_dir / digest[:2] / digest
+
+    def _manifest_path(self, name: str) -> Path:
+        """Return where the manifest of a backup is stored."""
+        return self.manifest_dir / f"{name}.json"
+
+    def put(self, data: bytes, compression: str = "none") -> str:
+        """Store a chunk unless an identical one exists, returning its hash.
+
+        The hash is taken before compression, so chunks dedupe across
+        backups written with different compression settings.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(path.name + '.tmp')
+            temp_path.write_bytes(compress(data, compression))
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Read a chunk, checking it against its hash."""
+        data = decompress(self._chunk_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"backup chunk {digest} is damaged")
+        return data
+
+    def backup(self, name: str, files: Dict[str, Iterable[bytes]], compression: str = "none") -> List[Dict]:
+        """Record a backup of files given as name -> lines.
+
+        Only chunks not already stored are written. The manifest is written
+        last, so an interrupted backup leaves no restore point behind.
+        Returns the name, size and SHA-256 of every file backed up.
+        """
+        manifest = {"name": name, "created": datetime.now().isoformat(timespec='seconds'), "files": []}
+        with self.lock:
+            refs = self._load_refs()
+            for file_name, lines in files.items():
+                digest = hashlib.sha256()
+                size = 0
+                chunks = []
+                for chunk in split_chunks(lines):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    chunks.append(self.put(chunk, compression))
+                manifest["files"].append({"name": file_name, "size": size, "sha256": digest.hexdigest(),
+                                          "chunks": chunks})
+
+            self.manifest_dir.mkdir(parents=True, exist_ok=True)
+            path = self._manifest_path(name)
+            temp_path = path.with_name(path.name + '.tmp')
+            temp_path.write_text(json.dumps(manifest), encoding='utf-8')
+            os.replace(temp_path, path)
+            for chunk_digest in {chunk for entry in manifest["files"] for chunk in entry["chunks"]}:
+                refs[chunk_digest] = refs.get(chunk_digest, 0) + 1
+            self._save_refs(refs)
+        return [{key: entry[key] for key in ("name", "size", "sha256")} for entry in manifest["files"]]
+
+    def manifest(self, name: str) -> Dict:
+        """Return the manifest of a backup."""
+        with open(self._manifest_path(name), 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def restore(self, name: str, directory: Path) -> List[Path]:
+        """Rebuild the files of a backup into a directory, returning their paths.
+
+        Every file is assembled in a temp file and verified before it is
+        renamed into place.
+        """
+        restored = []
+        for entry in self.manifest(name)["files"]:
+            target = directory / entry["name"]
+            temp_path = target.with_name(target.name + '.restore')
+            digest = hashlib.sha256()
+            with open(temp_path, 'wb') as file:
+                for chunk_digest in entry["chunks"]:
+                    data = self.get(chunk_digest)
+                    digest.update(data)
+                    file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            if digest.hexdigest() != entry["sha256"]:
+                temp_path.unlink()
+                raise ValueError(f"backup {name} does not reproduce {entry['name']}")
+            os.replace(temp_path, target)
+            restored.append(target)
+        return restored
+
+    def _chunks(self, name: str) -> Set[str]:
+        """Return the hashes of every chunk a backup uses, or none if it is gone."""
+        try:
+            manifest = self.manifest(name)
+        except FileNotFoundError:
+            return set()
+        return {digest for entry in manifest["files"] for digest in entry["chunks"]}
+
+    def _load_refs(self) -> Dict[str, int]:
+        """Read the chunk reference counts. Requires the lock.
+
+        A store written before reference counts were kept has them counted
+        from its manifests once.
+        """
+        try:
+            with open(self.refs_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            refs: Dict[str, int] = {}
+            for path in self.manifest_dir.glob("*.json"):
+                for digest in self._chunks(path.stem):
+                    refs[digest] = refs.get(digest, 0) + 1
+            return refs
+
+    def _save_refs(self, refs: Dict[str, int]) -> None:
+        """Replace the chunk reference counts. Requires the lock."""
+        self.chunk_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.refs_path.with_name(self.refs_path.name + '.tmp')
+        temp_path.write_text(json.dumps(refs), encoding='utf-8')
+        os.replace(temp_path, self.refs_path)
+
+    def remove(self, names: Iterable[str]) -> None:
+        """Delete backups and the chunks no other backup uses.
+
+        Only the manifests of the deleted backups are read, and only their
+        chunks are candidates, so the cost does not grow with the number of
+        backups kept.
+        """
+        with self.lock:
+            refs = self._load_refs()
+            for name in names:
+                chunks = self._chunks(name)
+                remove_file(self._manifest_path(name))
+                for digest in chunks:
+                    count = refs.get(digest, 0) - 1
+                    if count > 0:
+                        refs[digest] = count
+                        continue
+                    refs.pop(digest, None)
+                    remove_file(self._chunk_path(digest))
+            self._save_refs(refs)
@@ -0,0 +1,353 @@
+"""
+Column-store representation of the expense ledger.
+Keeps each field in a compact typed array and materializes Expense objects
+only when a row is accessed.
+"""
+
+import re
+from array import array
+from collections.abc import MutableSequence
+from datetime import date
+from decimal import Decimal
+from itertools import accumulate, chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from money import DEFAULT_DECIMAL_PLACES, from_minor
+
+# Range of the signed 64-bit amounts column, in minor units
+MIN_UNITS = -(1 << 63)
+MAX_UNITS = (1 << 63) - 1
+
+
+class StringPool:
+    """Interned strings addressed by integer codes.
+
+    A pool loaded from a string table keeps the table's text and end offsets
+    and only splits them into strings, and builds the reverse lookup, on
+    first use.
+    """
+
+    def __init__(self):
+        self._strings: Optional[List[str]] = []
+        self._codes: Optional[Dict[str, int]] = {}
+        self._text = ""
+        self._ends = array('q')
+
+    @classmethod
+    def from_table(cls, text: str, ends: array) -> "StringPool":
+        """Build a pool from concatenated distinct strings and their end offsets."""
+        pool = cls()
+        pool._strings = pool._codes = None
+        pool._text, pool._ends = text, ends
+        return pool
+
+    def __reduce__(self):
+        # Pickle as a string table rather than a list plus a reverse lookup
+        text, ends = self.table()
+        return StringPool.from_table, (text, array('q', ends))
+
+    def table(self) -> Tuple[str, array]:
+        """Return the pooled strings concatenated, with their end offsets."""
+        if self._strings is None:
+            return self._text, self._ends
+        ends = array('q', accumulate(map(len, self._strings)))
+        return "".join(self._strings), ends
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            text, ends = self._text, self._ends
+            self._strings = list(map(text.__getitem__, map(slice, chain((0,), ends), ends)))
+            self._text, self._ends = "", array('q')
+        return self._strings
+
+    @property
+    def codes(self) -> Dict[str, int]:
+        if self._codes is None:
+            self._codes = dict(zip(self.strings, range(len(self.strings))))
+        return self._codes
+
+    def __len__(self) -> int:
+        if self._strings is None:
+            return len(self._ends)
+        return len(self._strings)
+
+    def __getitem__(self, code: int) -> str:
+        if self._strings is None:
+            return self._text[self._ends[code - 1] if code else 0:self._ends[code]]
+        return self._strings[code]
+
+    def intern(self, value: str) -> int:
+        """Return the code of a string, adding it to the pool if needed."""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def lookup(self, value: str) -> int:
+        """Return the code of a string, or -1 if it is not pooled."""
+        return self.codes.get(value, -1)
+
+
+class TextColumn:
+    """One string per row, stored as a single UTF-8 blob with end offsets.
+
+    Suits values that rarely repeat, like descriptions, where a string pool
+    would keep a str object and a reverse-lookup entry per row. The blob and
+    offsets may also be memoryviews over a mapped snapshot, which are
+    read-only.
+    """
+
+    def __init__(self, blob=None, ends=None):
+        self.blob = bytearray() if blob is None else blob
+        self.ends = array('q') if ends is None else ends
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def _span(self, position: int) -> Tuple[int, int]:
+        """Return the byte range of a row's string within the blob."""
+        if position < 0:
+            position += len(self.ends)
+        if not 0 <= position < len(self.ends):
+            raise IndexError("text column index out of range")
+        return (self.ends[position - 1] if position else 0), self.ends[position]
+
+    def __getitem__(self, position: int) -> str:
+        start, end = self._span(position)
+        return str(self.blob[start:end], 'utf-8', 'surrogatepass')
+
+    def __iter__(self) -> Iterator[str]:
+        start = 0
+        blob = self.blob
+        for end in self.ends:
+            yield str(blob[start:end], 'utf-8', 'surrogatepass')
+            start = end
+
+    def _shift(self, position: int, delta: int) -> None:
+        """Move the end offsets from a row on by delta bytes."""
+        if delta:
+            self.ends[position:] = array('q', [end + delta for end in self.ends[position:]])
+
+    def append(self, value: str) -> None:
+        self.blob += value.encode('utf-8', 'surrogatepass')
+        self.ends.append(len(self.blob))
+
+    def extend(self, other: "TextColumn") -> None:
+        """Append every string of another column."""
+        base = len(self.blob)
+        self.blob += other.blob
+        self.ends.extend(array('q', [base + end for end in other.ends]))
+
+    def __setitem__(self, position: int, value: str) -> None:
+        start, end = self._span(position)
+        position %= len(self.ends)
+        data = value.encode('utf-8', 'surrogatepass')
+        self.blob[start:end] = data
+        self._shift(position, len(data) - (end - start))
+
+    def __delitem__(self, position: int) -> None:
+        start, end = self._span(position)
+        position %= len(self.ends)
+        del self.blob[start:end]
+        del self.ends[position]
+        self._shift(position, start - end)
+
+    def insert(self, position: int, value: str) -> None:
+        # Positions are clamped like list.insert
+        position = max(0, min(len(self.ends), position + len(self.ends) if position < 0 else position))
+        start = self.ends[position - 1] if position else 0
+        data = value.encode('utf-8', 'surrogatepass')
+        self.blob[start:start] = data
+        self.ends.insert(position, start)
+        self._shift(position, len(data))
+
+    def nbytes(self) -> int:
+        """Return the size of the blob and offsets in bytes."""
+        return len(self.blob) + self.ends.itemsize * len(self.ends)
+
+
+def month_ordinals(month: str) -> Tuple[int, int]:
+    """Return the [first, next month's first) ordinal range of a YYYY-MM month.
+
+    Raises ValueError for anything but a valid YYYY-MM month, which callers
+    treat as matching no stored date.
+    """
+    if not re.fullmatch(r'\d{4}-\d{2}', month):
+        raise ValueError(f"month {month!r} is not in YYYY-MM format")
+    year, month_number = int(month[:4]), int(month[5:7])
+    first = date(year, month_number, 1).toordinal()
+    if month_number == 12:
+        return first, date(year + 1, 1, 1).toordinal()
+    return first, date(year, month_number + 1, 1).toordinal()
+
+
+class ColumnarLedger(MutableSequence):
+    """Ledger stored as parallel arrays instead of one object per row.
+
+    Dates are ISO date ordinals, categories are codes into a string pool,
+    amounts are integers in minor units and descriptions are kept in a
+    TextColumn. Expenses whose date
+    is not an ISO YYYY-MM-DD string, or whose amount has more decimal places
+    than the minor unit or does not fit in 64 bits of minor units, are
+    rejected with ValueError.
+    """
+
+    def __init__(self, expense_type, decimal_places: int = DEFAULT_DECIMAL_PLACES, expenses: Iterable = ()):
+        self.expense_type = expense_type
+        self.decimal_places = decimal_places
+        self.dates = array('i')
+        self.categories = array('i')
+        self.amounts = array('q')
+        self.descriptions = TextColumn()
+        self.category_pool = StringPool()
+        self._date_strings: Dict[int, str] = {}
+        for expense in expenses:
+            self.append(expense)
+
+    def _encode(self, expense) -> Tuple[int, int, int, str]:
+        """Convert an expense into its column values."""
+        return self._encode_fields(expense.date, expense.category, expense.amount, expense.description)
+
+    def _encode_fields(self, date_str: str, category: str, amount: Decimal,
+                       description: str) -> Tuple[int, int, int, str]:
+        """Convert the fields of an expense into its column values."""
+        try:
+            ordinal = date.fromisoformat(date_str).toordinal()
+        except ValueError:
+            ordinal = None
+        if ordinal is None or self._date_string(ordinal) != date_str:
+            raise ValueError(f"date {date_str!r} is not an ISO YYYY-MM-DD date")
+
+        minor_units = amount.scaleb(self.decimal_places)
+        if minor_units != minor_units.to_integral_value():
+            raise ValueError(f"amount {amount} has more than {self.decimal_places} decimal places")
+        if not MIN_UNITS <= minor_units <= MAX_UNITS:
+            raise ValueError(f"amount {amount} is too large to store")
+
+        return (
+            ordinal,
+            self.category_pool.intern(category),
+            int(minor_units),
+            description
+        )
+
+    def _date_string(self, ordinal: int) -> str:
+        """Return the ISO string of a date ordinal, cached per distinct date."""
+        value = self._date_strings.get(ordinal)
+        if value is None:
+            value = self._date_strings[ordinal] = date.fromordinal(ordinal).isoformat()
+        return value
+
+    def amount(self, minor_units: int) -> Decimal:
+        """Convert minor units back to a Decimal amount."""
+        return from_minor(minor_units, self.decimal_places)
+
+    def _materialize(self, position: int):
+        """Build the Expense object for a row."""
+        return self.expense_type(
+            self._date_string(self.dates[position]),
+            self.category_pool[self.categories[position]],
+            self.amount(self.amounts[position]),
+            self.descriptions[position]
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("expense index out of range")
+        return self._materialize(index)
+
+    def __iter__(self) -> Iterator:
+        for position in range(len(self)):
+            yield self._materialize(position)
+
+    def __setitem__(self, index: int, expense) -> None:
+        values = self._encode(expense)
+        self.dates[index], self.categories[index], self.amounts[index], self.descriptions[index] = values
+
+    def __delitem__(self, index: int) -> None:
+        del self.dates[index]
+        del self.categories[index]
+        del self.amounts[index]
+        del self.descriptions[index]
+
+    def insert(self, index: int, expense) -> None:
+        ordinal, category, amount, description = self._encode(expense)
+        self.dates.insert(index, ordinal)
+        self.categories.insert(index, category)
+        self.amounts.insert(index, amount)
+        self.descriptions.insert(index, description)
+
+    def append(self, expense) -> None:
+        self._append_values(self._encode(expense))
+
+    def append_fields(self, date_str: str, category: str, amount: Decimal, description: str) -> None:
+        """Append a row from its fields without building an expense object."""
+        self._append_values(self._encode_fields(date_str, category, amount, description))
+
+    def _append_values(self, values: Tuple[int, int, int, str]) -> None:
+        """Append encoded column values as a new row."""
+        ordinal, category, amount, description = values
+        self.dates.append(ordinal)
+        self.categories.append(category)
+        self.amounts.append(amount)
+        self.descriptions.append(description)
+
+    def extend_ledger(self, other: "ColumnarLedger") -> None:
+        """Append every row of another column store with the same precision."""
+        if other.decimal_places != self.decimal_places:
+            raise ValueError("cannot merge ledgers stored with different precisions")
+        category_codes = [self.category_pool.intern(value) for value in other.category_pool.strings]
+        self.dates.extend(other.dates)
+        self.categories.extend(map(category_codes.__getitem__, other.categories))
+        self.amounts.extend(other.amounts)
+        self.descriptions.extend(other.descriptions)
+
+    def month_positions(self, month: str) -> Iterator[int]:
+        """Yield the row positions dated within a YYYY-MM month."""
+        try:
+            first, last = month_ordinals(month)
+        except ValueError:
+            return
+        for position, ordinal in enumerate(self.dates):
+            if first <= ordinal < last:
+                yield position
+
+    def rows(self, positions: Iterable[int]) -> List:
+        """Return the expenses at the given row positions."""
+        return [self._materialize(position) for position in positions]
+
+    def month_rows(self, month: str) -> List:
+        """Return the expenses of a YYYY-MM month, in ledger order."""
+        return self.rows(self.month_positions(month))
+
+    def category_total(self, month: str, category: str) -> Decimal:
+        """Return spending for one category in a YYYY-MM month."""
+        code = self.category_pool.lookup(category)
+        total = sum(self.amounts[p] for p in self.month_positions(month) if self.categories[p] == code)
+        return self.amount(total)
+
+    def month_totals(self, month: str) -> Dict[str, int]:
+        """Return spending per category for a YYYY-MM month, in minor units."""
+        totals: Dict[int, int] = {}
+        for position in self.month_positions(month):
+            code = self.categories[position]
+            totals[code] = totals.get(code, 0) + self.amounts[position]
+        return {self.category_pool[code]: units for code, units in totals.items()}
+
+    def used_categories(self) -> List[str]:
+        """Return the categories referenced by at least one row."""
+        return [self.category_pool[code] for code in set(self.categories)]
+
+    def nbytes(self) -> int:
+        """Return the size of the columns in bytes, description text included but not the category pool."""
+        return self.descriptions.nbytes() + sum(column.itemsize * len(column)
+                                                for column in (self.dates, self.categories, self.amounts))
@@ -23,6 +23,7 @@ except ImportError:
     RICH_AVAILABLE = False
 
 from expense_manager import ExpenseManager, Expense
+from compression import SUFFIXES, resolve
 
 class ExpenseUI:
     """Enhanced user interface for the expense tracker."""
@@ -153,7 +154,7 @@ class ExpenseUI:
             
             self.console.print(table)
             
-            total = sum(expense.amount for expense in expenses)
+            total = self.manager.total_amount(expenses)
             self.console.print(f"\n[bold]Total: {currency} {total:,.2f}[/bold]")
         else:
             print(f"\n{title}")
@@ -162,10 +163,9 @@ class ExpenseUI:
             print("-" * 80)
             
             currency = self.manager.config.get('currency', 'Rs.')
-            total = Decimal("0")
+            total = self.manager.total_amount(expenses)
             
             for i, expense in enumerate(expenses, 1):
-                total += expense.amount
                 desc = expense.description[:25] + "..." if len(expense.description) > 25 else expense.description
                 print(f"{i:<4} {expense.date:<12} {expense.category.title():<12} {currency} {expense.amount:>8.2f} {desc}")
             
@@ -205,7 +205,7 @@ class ExpenseUI:
             self.print_error("Invalid amount. Please enter a positive number.")
             return
         
-        amount = Decimal(amount_str).quantize(Decimal('0.01'))
+        amount = self.manager.quantize_amount(Decimal(amount_str))
         
         # Get description (optional)
         description = self.get_input("Enter description (optional)")
@@ -252,12 +252,12 @@ class ExpenseUI:
                 self.print_error("Invalid date or amount format.")
                 return
             
-            amount = Decimal(amount_str).quantize(Decimal('0.01'))
+            amount = self.manager.quantize_amount(Decimal(amount_str))
             
-            if self.manager.edit_expense(index, date_input, category, amount, description):
+            if self.manager.edit_expense(index, date_input, category, amount, description, expected=current_expense):
                 self.print_success("Expense updated successfully!")
             else:
-                self.print_error("Failed to update expense.")
+                self.print_error("Failed to update expense. It may have been changed by another session.")
                 
         except (ValueError, KeyboardInterrupt):
             self.print_error("Invalid input.")
@@ -478,8 +478,8 @@ class ExpenseUI:
         export_type = self.get_input("Export type", choices=["all", "filtered", "monthly"])
         filename = self.get_input("Enter filename (without extension)", default=f"expenses_{datetime.now().strftime('%Y%m%d')}")
         
-        if not filename.endswith('.csv'):
-            filename += '.csv'
+        if not filename.endswith(('.csv', '.csv.gz', '.csv.zst')):
+            filename += '.csv' + SUFFIXES[resolve(self.manager.config.get('export_compression', 'none'))]
         
         expenses_to_export = []
         
@@ -511,6 +511,73 @@ class ExpenseUI:
         else:
             self.print_error("Failed to export data.")
     
+    def import_data(self):
+        """Handle bulk import from a CSV file."""
+        if RICH_AVAILABLE:
+            self.console.print("\n[bold blue]Import Expenses[/bold blue]")
+            self.console.print("[dim]The file needs date, category and amount columns; description is optional.[/dim]")
+        else:
+            print("\n--- Import Expenses ---")
+            print("The file needs date, category and amount columns; description is optional.")
+        
+        filename = self.get_input("Enter CSV filename")
+        try:
+            expenses, errors = self.manager.read_import(filename)
+        except (OSError, ValueError) as e:
+            self.print_error(f"Could not read {filename}: {e}")
+            return
+        
+        for line, reason in errors:
+            self.print_warning(f"Line {line}: {reason}")
+        if not expenses:
+            self.print_error("No valid expenses to import.")
+            return
+        
+        message = f"Import {len(expenses)} expenses"
+        if errors:
+            message += f" and skip {len(errors)} invalid rows"
+        if self.get_confirmation(message + "?"):
+            if self.manager.add_expenses(expenses):
+                self.print_success(f"Imported {len(expenses)} expenses")
+            else:
+                self.print_error("Failed to import expenses.")
+    
+    def restore_backup(self):
+        """Handle restoring the ledger from a backup."""
+        backups = self.manager.list_backups()
+        if not backups:
+            self.print_warning("No backups found.")
+            return
+        
+        # Most recent first, numbered for selection
+        recent = backups[::-1][:20]
+        lines = [
+            f"{datetime.fromtimestamp(record.created):%Y-%m-%d %H:%M}  {record.kind:<11}  {record.size / 1024:,.0f} KB"
+            for record in recent
+        ]
+        if RICH_AVAILABLE:
+            self.console.print("\n[bold blue]Restore Backup[/bold blue]")
+            for number, line in enumerate(lines, 1):
+                self.console.print(f"[cyan]{number}.[/cyan] {line}")
+        else:
+            print("\n--- Restore Backup ---")
+            for number, line in enumerate(lines, 1):
+                print(f"{number}. {line}")
+        
+        choice = self.get_input("Choose backup", choices=[str(number) for number in range(1, len(recent) + 1)])
+        name = recent[int(choice) - 1].name
+        if not self.get_confirmation(f"Replace all current expenses with backup {name}?"):
+            return
+        try:
+            restored = self.manager.restore_backup(name)
+        except (OSError, ValueError) as e:
+            self.print_error(f"Could not restore {name}: {e}")
+            return
+        if restored:
+            self.print_success(f"Restored {name} ({len(self.manager.expenses)} expenses)")
+        else:
+            self.print_error("Failed to restore backup.")
+    
     def settings_menu(self):
         """Handle settings management."""
         if RICH_AVAILABLE:
@@ -539,6 +606,8 @@ class ExpenseUI:
                 menu.add_row("[bold cyan]2.[/bold cyan]", "Toggle Auto Backup")
                 menu.add_row("[bold cyan]3.[/bold cyan]", "Manage Categories")
                 menu.add_row("[bold cyan]4.[/bold cyan]", "Create Backup")
+                menu.add_row("[bold cyan]5.[/bold cyan]", "Import Expenses")
+                menu.add_row("[bold cyan]6.[/bold cyan]", "Restore Backup")
                 menu.add_row("[bold red]0.[/bold red]", "Back to Main Menu")
                 
                 self.console.print(menu)
@@ -551,14 +620,15 @@ class ExpenseUI:
                 print("2. Toggle Auto Backup")
                 print("3. Manage Categories")
                 print("4. Create Backup")
+                print("5. Import Expenses")
+                print("6. Restore Backup")
                 print("0. Back to Main Menu")
             
-            choice = self.get_input("Choose option", choices=["1", "2", "3", "4", "0"])
+            choice = self.get_input("Choose option", choices=["1", "2", "3", "4", "5", "6", "0"])
             
             if choice == "1":
                 new_currency = self.get_input("Enter new currency symbol", default=self.manager.config.get('currency', 'Rs.'))
-                self.manager.config['currency'] = new_currency
-                self.manager.save_config()
+                self.manager.set_currency(new_currency)
                 self.print_success(f"Currency changed to {new_currency}")
             
             elif choice == "2":
@@ -575,6 +645,12 @@ class ExpenseUI:
                 self.manager.backup_data()
                 self.print_success("Manual backup created successfully!")
             
+            elif choice == "5":
+                self.import_data()
+            
+            elif choice == "6":
+                self.restore_backup()
+            
             elif choice == "0":
                 break
     
@@ -650,10 +726,10 @@ class ExpenseUI:
             currency = self.manager.config.get('currency', 'Rs.')
             
             if self.get_confirmation(f"Delete expense: {expense.date} - {expense.category} - {currency}{expense.amount}?"):
-                if self.manager.delete_expense(index):
+                if self.manager.delete_expense(index, expected=expense):
                     self.print_success("Expense deleted successfully!")
                 else:
-                    self.print_error("Failed to delete expense.")
+                    self.print_error("Failed to delete expense. It may have been changed by another session.")
         
         except (ValueError, KeyboardInterrupt):
             self.print_error("Invalid input.")
@@ -663,54 +739,65 @@ class ExpenseUI:
         if not RICH_AVAILABLE:
             print("Note: Install 'rich' library for enhanced UI experience: pip install rich")
         
-        while True:
-            try:
-                self.print_header()
-                self.show_menu()
-                
-                choice = self.get_input("\nChoose an option", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"])
-                
-                if choice == "1":
-                    self.add_expense()
-                elif choice == "2":
-                    self.display_expenses_table(self.manager.expenses, "All Expenses")
-                elif choice == "3":
-                    self.search_expenses()
-                elif choice == "4":
-                    self.edit_expense()
-                elif choice == "5":
-                    self.delete_expense()
-                elif choice == "6":
-                    self.monthly_report()
-                elif choice == "7":
-                    self.manage_budgets()
-                elif choice == "8":
-                    self.export_data()
-                elif choice == "9":
-                    self.settings_menu()
-                elif choice == "0":
-                    if self.get_confirmation("Are you sure you want to exit?"):
+        try:
+            while True:
+                try:
+                    self.print_header()
+                    self.show_menu()
+                    
+                    choice = self.get_input("\nChoose an option", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"])
+                    
+                    # Other sessions may have changed the ledger while waiting for input
+                    if self.manager.refresh():
                         if RICH_AVAILABLE:
-                            self.console.print("\n[bold green]Thank you for using Personal Expense Tracker Pro![/bold green]")
+                            self.console.print("[dim]Ledger updated by another session.[/dim]")
                         else:
-                            print("\nThank you for using Personal Expense Tracker Pro!")
-                        break
+                            print("Ledger updated by another session.")
+                    
+                    if choice == "1":
+                        self.add_expense()
+                    elif choice == "2":
+                        self.display_expenses_table(self.manager.expenses, "All Expenses")
+                    elif choice == "3":
+                        self.search_expenses()
+                    elif choice == "4":
+                        self.edit_expense()
+                    elif choice == "5":
+                        self.delete_expense()
+                    elif choice == "6":
+                        self.monthly_report()
+                    elif choice == "7":
+                        self.manage_budgets()
+                    elif choice == "8":
+                        self.export_data()
+                    elif choice == "9":
+                        self.settings_menu()
+                    elif choice == "0":
+                        if self.get_confirmation("Are you sure you want to exit?"):
+                            if RICH_AVAILABLE:
+                                self.console.print("\n[bold green]Thank you for using Personal Expense Tracker Pro![/bold green]")
+                            else:
+                                print("\nThank you for using Personal Expense Tracker Pro!")
+                            break
+                    
+                    # Pause before showing menu again
+                    if RICH_AVAILABLE:
+                        Prompt.ask("\nPress Enter to continue", default="")
+                    else:
+                        input("\nPress Enter to continue...")
                 
-                # Pause before showing menu again
-                if RICH_AVAILABLE:
-                    Prompt.ask("\nPress Enter to continue", default="")
-                else:
-                    input("\nPress Enter to continue...")
-            
-            except KeyboardInterrupt:
-                if self.get_confirmation("\nAre you sure you want to exit?"):
-                    break
-            except Exception as e:
-                self.print_error(f"An unexpected error occurred: {str(e)}")
-                if RICH_AVAILABLE:
-                    Prompt.ask("Press Enter to continue", default="")
-                else:
-                    input("Press Enter to continue...")
+                except KeyboardInterrupt:
+                    if self.get_confirmation("\nAre you sure you want to exit?"):
+                        break
+                except Exception as e:
+                    self.print_error(f"An unexpected error occurred: {str(e)}")
+                    if RICH_AVAILABLE:
+                        Prompt.ask("Press Enter to continue", default="")
+                    else:
+                        input("Press Enter to continue...")
+        finally:
+            self.manager.close()
+
 
 if __name__ == "__main__":
     app = ExpenseUI()
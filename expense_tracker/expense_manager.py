@@ -4,13 +4,16 @@ A professional-grade CLI expense management system with advanced features.
 """
 
 import csv
+import io
 import json
-import shutil
+import os
+import struct
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterator, Optional, Tuple
 from dataclasses import dataclass, asdict
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 try:
     from rich.console import Console
@@ -25,9 +28,36 @@ except ImportError:
     print("Installing rich library for better UI experience...")
     print("Run: pip install rich")
 
+from storage import (
+    append_rows, append_journal, read_journal, read_ledger, write_atomic, parse_appended_rows, parse_journal,
+    count_rows, read_footer_checksum, remove_file, JournalOverlay, LazyLedger, LedgerIntegrityError
+)
+from sqlite_store import SqliteStore, SqliteExpenseList, to_units
+from indexes import ExpenseIndex
+from query import SearchQuery, run_search
+from columnar import ColumnarLedger
+from backup import (
+    DEFAULT_RETENTION, BackupCatalog, BackupRecord, BackupScheduler, capture, copy_captured,
+    expired_backups, file_digest, restore_file, store_captured
+)
+from chunks import ChunkStore
+from locking import LedgerLock
+from watcher import FileWatcher, file_state, read_appended
+from compression import SUFFIXES, compression_for, file_compression, open_text_reader, open_writer, resolve
+from parallel_loader import PARALLEL_LOAD_MIN_BYTES, load_columnar
+from snapshot import map_snapshot, read_snapshot, source_stamp, write_snapshot
+from vectorized import (
+    NUMPY_AVAILABLE, search_positions, month_positions, month_totals, category_units, total_units
+)
+from money import DEFAULT_CURRENCY_PRECISION, currency_decimal_places, from_minor, quantize, to_minor
+
 # Constants
 DATA_DIR = Path("data")
 EXPENSES_FILE = DATA_DIR / "expenses.csv"
+JOURNAL_FILE = DATA_DIR / "expenses.journal"
+DATABASE_FILE = DATA_DIR / "expenses.db"
+SNAPSHOT_FILE = DATA_DIR / "expenses.snap"
+LOCK_FILE = DATA_DIR / "expenses.lock"
 CONFIG_FILE = DATA_DIR / "config.json"
 BACKUP_DIR = DATA_DIR / "backups"
 
@@ -52,6 +82,22 @@ class Expense:
             'amount': str(self.amount),
             'description': self.description
         }
+    
+    @classmethod
+    def from_dict(cls, row: Dict) -> "Expense":
+        """Create an expense from a CSV or journal row."""
+        return cls(
+            date=row['date'],
+            category=row['category'],
+            amount=Decimal(row['amount']),
+            description=row.get('description') or ''
+        )
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk import."""
+    imported: int
+    errors: List[Tuple[int, str]]  # (line number, reason) of each rejected row
 
 @dataclass
 class Budget:
@@ -63,13 +109,35 @@ class Budget:
 class ExpenseManager:
     """Core expense management logic."""
     
-    def __init__(self):
+    def __init__(self, read_only: bool = False, load: bool = True):
         self.console = Console() if RICH_AVAILABLE else None
+        self.read_only = read_only
         self.expenses: List[Expense] = []
         self.config: Dict = {}
+        self._journal_entries = 0
+        self._base_checksum: Optional[str] = None
+        self._base_rows: Optional[int] = None
+        self.store: Optional[SqliteStore] = None
+        self.index: Optional[ExpenseIndex] = None
+        self._snapshot_stamp = None
+        self.backups: Optional[BackupScheduler] = None
+        self.chunk_store = ChunkStore(BACKUP_DIR)
+        self.backup_catalog = BackupCatalog(BACKUP_DIR / "catalog.jsonl")
+        self.lock = LedgerLock(LOCK_FILE)
+        self._generation = 0
+        self._synced = {}
+        self._loaded = False
         self._initialize_data_structure()
-        self.load_expenses()
         self.load_config()
+        self._load_backup_catalog()
+        self.backups = BackupScheduler(self.config.get('backup_frequency', 7), self.backup_catalog.newest())
+        self.watcher = FileWatcher([EXPENSES_FILE, JOURNAL_FILE])
+        # With load=False only the configuration and backup catalog are read, so
+        # backups can still be listed and restored when the ledger fails to load
+        with self._locked():
+            self._open_store(migrate=load)
+            if load:
+                self.load_expenses()
     
     def _initialize_data_structure(self) -> None:
         """Create necessary directories and files."""
@@ -96,7 +164,23 @@ class ExpenseManager:
             "categories": DEFAULT_CATEGORIES,
             "budgets": {},
             "auto_backup": True,
-            "backup_frequency": 7  # days
+            "backup_frequency": 7,  # days
+            "backup_mode": "full",  # "full" copies or deduplicated "incremental" backups
+            "backup_compression": "none",  # "none", "gzip" or "zstd"
+            "export_compression": "none",  # "none", "gzip" or "zstd"
+            "backup_keep": 10,  # most recent backups always kept
+            "backup_retention": DEFAULT_RETENTION,  # further backups kept per hour, day, week and month
+            "write_mode": "append",  # "append", "journal" or "rewrite"
+            "fsync_policy": "never",  # "never" or "always"
+            "journal_compact_threshold": 1000,  # journal records before compaction
+            "storage_backend": "csv",  # "csv" or "sqlite"
+            "keyword_search": "substring",  # "substring", "word" or "prefix"
+            "preload": True,  # False streams the ledger from disk instead of loading it
+            "memory_layout": "objects",  # "objects" or "columnar"
+            "currency_precision": DEFAULT_CURRENCY_PRECISION,  # decimal places per currency symbol
+            "vectorized": True,  # use NumPy for columnar searches and reports when installed
+            "snapshot": True,  # keep a binary copy of the ledger for fast startup
+            "load_workers": 0  # processes parsing large columnar ledgers, 0 for one per CPU
         }
         with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
             json.dump(default_config, file, indent=2)
@@ -115,48 +199,605 @@ class ExpenseManager:
         with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
             json.dump(self.config, file, indent=2)
     
+    def set_currency(self, currency: str) -> None:
+        """Change the currency symbol, reloading if its minor unit differs."""
+        places = self._decimal_places()
+        self.config['currency'] = currency
+        self.save_config()
+        if self._decimal_places() != places and not self.store:
+            self.load_expenses()
+    
+    def _decimal_places(self) -> int:
+        """Return the minor-unit precision of the configured currency."""
+        return currency_decimal_places(self.config)
+    
+    def _open_store(self, migrate: bool = True) -> None:
+        """Open the SQLite backend if configured, migrating the CSV ledger once unless migrate is False."""
+        if self.config.get('storage_backend', 'csv') != 'sqlite':
+            return
+        
+        self.store = SqliteStore(DATABASE_FILE, Expense)
+        if migrate and self.store.needs_migration:
+            self._load_csv()
+            try:
+                self.store.migrate(self.expenses)
+            except ValueError as error:
+                # The migration is atomic, so it is simply tried again next time
+                self._warn(f"SQLite backend unavailable: {error}; using the CSV ledger")
+                self.store.close()
+                self.store = None
+    
+    def _locked(self):
+        """Hold the ledger lock, or nothing in read-only mode, which never writes."""
+        return nullcontext() if self.read_only else self.lock
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold the ledger lock for a change, catching up first with changes made since the last read.
+        
+        Other sessions bump the lock generation, but programs appending to
+        expenses.csv directly do not, so the ledger files are checked too.
+        Otherwise the commit would mark their rows as read without loading them.
+        """
+        with self.lock:
+            # A ledger that was never loaded has nothing in memory to bring up to date
+            if self._loaded:
+                if not self.store:
+                    self._catch_up()
+                elif self.lock.generation() != self._generation:
+                    self.load_expenses()
+                self._generation = self.lock.generation()
+            yield
+            self._generation = self.lock.bump()
+            self._mark_synced()
+    
+    def _mark_synced(self) -> None:
+        """Record how far this session has read the ledger files."""
+        self._synced = {path: file_state(path) for path in (EXPENSES_FILE, JOURNAL_FILE)}
+    
     def load_expenses(self) -> None:
-        """Load all expenses from CSV file."""
-        self.expenses = []
+        """Load all expenses from the configured storage backend."""
+        with self._locked():
+            if not self.read_only:
+                self._generation = self.lock.generation()
+            # Compacting a replayed journal must not catch up with files still being read
+            self._loaded = False
+            self._load_ledger()
+            self._mark_synced()
+            self._loaded = True
+    
+    def refresh(self) -> bool:
+        """Pick up changes other processes made to the ledger files.
+        
+        Rows appended to the CSV file or journal are read on their own and
+        added to the indexes; any other change reloads the whole ledger.
+        Returns whether the ledger changed.
+        """
+        if self.store or not self._loaded or not self.watcher.changed():
+            return False
+        with self._locked():
+            changed = self._catch_up()
+            if not self.read_only:
+                self._generation = self.lock.generation()
+        return changed
+    
+    def _changed_files(self) -> List[Path]:
+        """Return the ledger files that changed since this session last read them."""
+        return [path for path in (EXPENSES_FILE, JOURNAL_FILE) if file_state(path) != self._synced.get(path)]
+    
+    def _catch_up(self) -> bool:
+        """Bring the loaded ledger up to date with its files, returning whether they had changed."""
+        changed = self._changed_files()
+        if not changed:
+            return False
+        if not self._read_appended(changed):
+            self.load_expenses()
+        return True
+    
+    def _read_appended(self, changed: List[Path]) -> bool:
+        """Apply rows appended to changed ledger files, returning False if a full reload is needed."""
+        # Streamed and mapped ledgers are not held in memory, and base rows appended
+        # behind a journal have to be folded in with it by a reload
+        if self._streaming or self.read_only or (EXPENSES_FILE in changed and JOURNAL_FILE.exists()):
+            return False
+        
+        appended = {}
+        for path in changed:
+            try:
+                appended[path] = read_appended(path, self._synced.get(path))
+            except FileNotFoundError:
+                return False
+            if appended[path] is None:
+                return False
+        
         try:
-            with open(EXPENSES_FILE, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    expense = Expense(
-                        date=row['date'],
-                        category=row['category'],
-                        amount=Decimal(row['amount']),
-                        description=row.get('description', '')
-                    )
-                    self.expenses.append(expense)
+            if EXPENSES_FILE in appended:
+                rows = parse_appended_rows(EXPENSES_FILE, appended[EXPENSES_FILE][0])
+                for row in rows:
+                    self._apply_record({'op': 'add', 'row': row})
+                if self._base_rows is not None:
+                    self._base_rows += len(rows)
+            if JOURNAL_FILE in appended:
+                records = parse_journal(appended[JOURNAL_FILE][0].decode('utf-8').splitlines())
+                if records and records[0].get('op') == 'base':
+                    # A journal started since the last read must belong to the current base file
+                    if (records[0].get('checksum') != self._base_checksum
+                            or records[0].get('rows') not in (None, self._base_rows)):
+                        return False
+                    records = records[1:]
+                for record in records:
+                    self._apply_record(record)
+                self._journal_entries += len(records)
+        except (ValueError, KeyError):
+            # Rows the ledger cannot hold; the reload sorts them out
+            return False
+        
+        for path, (_, state) in appended.items():
+            self._synced[path] = state
+        return True
+    
+    def _apply_record(self, record: Dict) -> None:
+        """Apply one journal operation to the loaded ledger and its indexes."""
+        op = record.get('op')
+        index = record.get('index', -1)
+        if op == 'add':
+            expense = Expense.from_dict(record['row'])
+            self.expenses.append(expense)
+            if self.index is not None:
+                self.index.add(expense)
+        elif op == 'edit' and 0 <= index < len(self.expenses):
+            previous, expense = self.expenses[index], Expense.from_dict(record['row'])
+            self.expenses[index] = expense
+            if self.index is not None:
+                self.index.replace(previous, expense)
+        elif op == 'delete' and 0 <= index < len(self.expenses):
+            if self.index is not None:
+                self.index.remove(self.expenses[index])
+            del self.expenses[index]
+    
+    def _load_ledger(self) -> None:
+        """Load the ledger from the configured storage backend."""
+        # Indexes are rebuilt once the rows are loaded
+        self.index = None
+        if self.store:
+            self.expenses = SqliteExpenseList(self.store)
+            return
+        if not self.read_only:
+            self._inflate_ledger()
+        if not self.config.get('preload', True):
+            self._open_streaming()
+            return
+        if not (self.read_only and self._map_snapshot()) and not self._load_snapshot():
+            self._load_csv()
+            self.save_snapshot()
+            # Read-only processes share the mapped snapshot rather than keep a private copy
+            if self.read_only:
+                self._map_snapshot()
+        if isinstance(self.expenses, ColumnarLedger):
+            # The indexes hold one object per row, which the column store avoids
+            self.index = None
+        else:
+            self.index = ExpenseIndex(self._decimal_places())
+            self.index.rebuild(self.expenses)
+    
+    def _inflate_ledger(self) -> None:
+        """Decompress a ledger or journal that was put back from a compressed copy by hand."""
+        for path in (EXPENSES_FILE, JOURNAL_FILE):
+            if path.exists() and file_compression(path) != 'none':
+                restore_file(path, path)
+    
+    def _load_snapshot(self) -> bool:
+        """Load the ledger from its binary snapshot if it matches the files on disk."""
+        if not self.config.get('snapshot', True):
+            return False
+        stamp = source_stamp(EXPENSES_FILE, JOURNAL_FILE)
+        loaded = read_snapshot(SNAPSHOT_FILE, Expense, stamp, self._decimal_places())
+        if loaded is None:
+            return False
+        
+        ledger, header = loaded
+        if self.config.get('memory_layout', 'objects') == 'columnar':
+            self.expenses = ledger
+        else:
+            self.expenses = list(ledger)
+        self._base_checksum = header.base_checksum
+        self._base_rows = header.base_rows
+        self._journal_entries = header.journal_entries
+        self._snapshot_stamp = stamp
+        if self._journal_needs_compaction():
+            self.compact()
+        return True
+    
+    def _map_snapshot(self) -> bool:
+        """Map the binary snapshot read-only if it matches the files on disk."""
+        stamp = source_stamp(EXPENSES_FILE, JOURNAL_FILE)
+        mapped = map_snapshot(SNAPSHOT_FILE, Expense, stamp, self._decimal_places())
+        if mapped is None:
+            return False
+        
+        self.expenses, header = mapped
+        self._base_checksum = header.base_checksum
+        self._base_rows = header.base_rows
+        self._journal_entries = header.journal_entries
+        self._snapshot_stamp = stamp
+        return True
+    
+    def save_snapshot(self) -> None:
+        """Write the binary snapshot if the ledger files changed since the last one."""
+        if self.store or self._streaming or not self.config.get('snapshot', True):
+            return
+        stamp = source_stamp(EXPENSES_FILE, JOURNAL_FILE)
+        if stamp == self._snapshot_stamp:
+            return
+        
+        # The snapshot only speeds up startup, so failing to write one never fails a load or close
+        ledger = self.expenses
+        if not isinstance(ledger, ColumnarLedger):
+            try:
+                ledger = ColumnarLedger(Expense, self._decimal_places(), self.expenses)
+            except (ValueError, OverflowError):
+                # Rows the column store cannot hold are never snapshotted
+                return
+        try:
+            write_snapshot(SNAPSHOT_FILE, ledger, stamp, self._base_rows, self._journal_entries, self._base_checksum)
+        except (OSError, ValueError, OverflowError, struct.error):
+            # e.g. a read-only data directory, or values the snapshot header cannot hold
+            return
+        self._snapshot_stamp = stamp
+    
+    def close(self) -> None:
+        """Finish pending backups, save the startup snapshot and release the storage backend."""
+        if self.config.get('auto_backup', True) and self.backups.due():
+            with self._locked():
+                job = self._backup_job()
+            self.backups.start(job, background=False)
+        self.backups.wait()
+        if self.backups.error:
+            self._warn(f"Backup failed: {self.backups.error}")
+        with self._locked():
+            # Another process's commit, or rows appended without one, leave this
+            # session's copy of the ledger out of date
+            if self._loaded and (self.read_only or (self.lock.generation() == self._generation and
+                                                    not self._changed_files())):
+                self.save_snapshot()
+        self.watcher.close()
+        if self.store:
+            self.store.close()
+    
+    def _load_csv(self) -> None:
+        """Load all expenses from CSV file and replay the journal."""
+        columnar = self.config.get('memory_layout', 'objects') == 'columnar' and not self.store
+        workers = self._load_workers()
+        if columnar and workers > 1:
+            try:
+                self.expenses, self._base_checksum = load_columnar(EXPENSES_FILE, Expense, self._decimal_places(), workers)
+            except LedgerIntegrityError:
+                raise
+            except ValueError as error:
+                self._columnar_unavailable(error)
+                columnar = False
+            else:
+                self._base_rows = len(self.expenses)
+                self._replay_journal()
+                return
+        
+        self.expenses = ColumnarLedger(Expense, self._decimal_places()) if columnar else []
+        try:
+            rows, self._base_checksum = read_ledger(EXPENSES_FILE)
         except FileNotFoundError:
             self._create_expenses_file()
+            rows, self._base_checksum = [], None
+        
+        try:
+            for row in rows:
+                self.expenses.append(Expense.from_dict(row))
+        except ValueError as error:
+            self._columnar_unavailable(error)
+            self.expenses = [Expense.from_dict(row) for row in rows]
+        self._base_rows = len(self.expenses)
+        
+        self._replay_journal()
     
-    def save_expenses(self) -> None:
-        """Save all expenses to CSV file."""
-        with open(EXPENSES_FILE, 'w', newline='', encoding='utf-8') as file:
-            if self.expenses:
-                writer = csv.DictWriter(file, fieldnames=['date', 'category', 'amount', 'description'])
-                writer.writeheader()
-                for expense in self.expenses:
-                    writer.writerow(expense.to_dict())
+    def _load_workers(self) -> int:
+        """Return how many processes should parse the CSV ledger."""
+        try:
+            if EXPENSES_FILE.stat().st_size < PARALLEL_LOAD_MIN_BYTES:
+                return 1
+        except FileNotFoundError:
+            return 1
+        return self.config.get('load_workers', 0) or os.cpu_count() or 1
+    
+    def _warn(self, message: str) -> None:
+        """Print a warning."""
+        if RICH_AVAILABLE:
+            self.console.print(f"⚠️  {message}", style="bold yellow")
+        else:
+            print(f"⚠️  {message}")
+    
+    def _columnar_unavailable(self, error: ValueError) -> None:
+        """Warn that the ledger holds rows the column store rejects."""
+        # Only the column store rejects rows; plain objects are kept instead
+        self._warn(f"Columnar layout unavailable: {error}")
+    
+    def _open_streaming(self) -> None:
+        """Open the CSV ledger for streaming access without loading its rows."""
+        self.index = None
+        self._base_checksum = read_footer_checksum(EXPENSES_FILE)
+        self._base_rows = count_rows(EXPENSES_FILE)
+        records, journal_rows = self._read_pending_journal(self._base_rows)
+        
+        overlay = JournalOverlay(journal_rows)
+        for record in records:
+            overlay.apply(record)
+        if journal_rows < self._base_rows:
+            overlay.grow(self._base_rows - journal_rows)
+        self.expenses = LazyLedger(EXPENSES_FILE, Expense, overlay)
+        
+        if (journal_rows < self._base_rows and not self.read_only) or self._journal_needs_compaction():
+            self.compact()
+    
+    def _read_pending_journal(self, base_rows: int) -> Tuple[List[Dict], int]:
+        """Read the journal operations not yet folded into the base CSV file.
+        
+        Returns them with the number of base rows they were written against,
+        which is less than base_rows if rows were appended to the base file since.
+        """
+        records = read_journal(JOURNAL_FILE)
+        journal_rows = base_rows
+        
+        # The journal is bound to the base file it was written against; a journal
+        # left over from an interrupted compaction is already folded into the base.
+        if records and records[0].get('op') == 'base':
+            if records[0].get('checksum') != self._base_checksum:
+                JOURNAL_FILE.unlink()
+                records = []
             else:
-                # Write just headers if no expenses
-                writer = csv.DictWriter(file, fieldnames=['date', 'category', 'amount', 'description'])
-                writer.writeheader()
+                if records[0].get('rows') is not None:
+                    journal_rows = records[0]['rows']
+                records = records[1:]
+        if journal_rows > base_rows:
+            # Positions in the journal would point at the wrong rows
+            raise LedgerIntegrityError(f"{EXPENSES_FILE} holds {base_rows} rows but its journal was "
+                                       f"written against {journal_rows}; restore it from a backup")
+        self._journal_entries = len(records)
+        return records, journal_rows
+    
+    def _journal_needs_compaction(self) -> bool:
+        """Whether a replayed journal should be folded into the base file."""
+        # Fold the journal away once it is large, or when journaling was switched off
+        return not self.read_only and self._journal_entries > 0 and (self._write_mode() != 'journal' or
+                                  self._journal_entries >= self.config.get('journal_compact_threshold', 1000))
+    
+    def _replay_journal(self) -> None:
+        """Apply pending journal operations on top of the loaded CSV rows."""
+        records, journal_rows = self._read_pending_journal(len(self.expenses))
+        
+        # Rows appended to the base file after the journal was started follow its operations
+        appended = [self.expenses[index] for index in range(journal_rows, len(self.expenses))]
+        for _ in appended:
+            del self.expenses[-1]
+        for record in records:
+            self._apply_record(record)
+        for expense in appended:
+            self.expenses.append(expense)
+        
+        # Journal positions no longer match the base file, so fold them into a new one
+        if (appended and not self.read_only) or self._journal_needs_compaction():
+            self.compact()
+    
+    @property
+    def _streaming(self) -> bool:
+        """Whether the ledger is streamed from disk rather than held in memory."""
+        return isinstance(self.expenses, LazyLedger)
+    
+    @property
+    def _vectorized(self) -> bool:
+        """Whether searches and reports run as NumPy kernels over the column store."""
+        return (NUMPY_AVAILABLE and isinstance(self.expenses, ColumnarLedger)
+                and self.config.get('vectorized', True))
+    
+    def _write_mode(self) -> str:
+        """Return the configured write mode."""
+        return self.config.get('write_mode', 'append')
+    
+    def _log_operations(self, *records: Dict) -> None:
+        """Append operations to the journal, compacting it past the threshold."""
+        fsync = self.config.get('fsync_policy', 'never') == 'always'
+        if self._journal_entries == 0 and not JOURNAL_FILE.exists():
+            records = ({'op': 'base', 'checksum': self._base_checksum, 'rows': self._base_rows},) + records
+        append_journal(JOURNAL_FILE, records, fsync=fsync)
+        self._journal_entries += sum(1 for record in records if record['op'] != 'base')
+        
+        if self._journal_entries >= self.config.get('journal_compact_threshold', 1000):
+            self.compact()
+    
+    def compact(self) -> None:
+        """Fold the journal into a fresh base CSV file."""
+        with self._transaction():
+            self.save_expenses()
+    
+    def save_expenses(self) -> None:
+        """Atomically save all expenses to CSV file."""
+        self._base_checksum, self._base_rows = write_atomic(EXPENSES_FILE, (expense.to_dict() for expense in self.expenses))
+        if isinstance(self.expenses, LazyLedger):
+            self.expenses.overlay = JournalOverlay(self._base_rows)
+        
+        # A full rewrite supersedes any pending journal operations
+        if JOURNAL_FILE.exists():
+            JOURNAL_FILE.unlink()
+        self._journal_entries = 0
+    
+    def _append_expenses(self, expenses: List[Expense]) -> None:
+        """Append expense rows to the CSV file in one write."""
+        if not EXPENSES_FILE.exists():
+            self._create_expenses_file()
+        fsync = self.config.get('fsync_policy', 'never') == 'always'
+        append_rows(EXPENSES_FILE, [expense.to_dict() for expense in expenses], fsync=fsync)
+        if self._base_rows is not None:
+            self._base_rows += len(expenses)
+    
+    def _commit_streaming(self, *records: Dict) -> None:
+        """Apply operations while the ledger is streamed rather than held in memory."""
+        write_mode = self._write_mode()
+        if write_mode == 'journal':
+            for record in records:
+                self.expenses.overlay.apply(record)
+            self._log_operations(*records)
+        elif write_mode == 'append' and all(record['op'] == 'add' for record in records):
+            self._append_expenses([Expense.from_dict(record['row']) for record in records])
+            self.expenses.overlay.grow(len(records))
+        else:
+            # Rewrites stream the old file through the pending changes into the new one
+            for record in records:
+                self.expenses.overlay.apply(record)
+            self.save_expenses()
     
     def backup_data(self) -> None:
-        """Create a backup of the expenses file."""
-        if EXPENSES_FILE.exists():
-            backup_name = f"expenses_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            backup_path = BACKUP_DIR / backup_name
-            shutil.copy2(EXPENSES_FILE, backup_path)
-            
-            # Keep only last 10 backups
-            backups = sorted(BACKUP_DIR.glob("expenses_backup_*.csv"))
-            if len(backups) > 10:
-                for old_backup in backups[:-10]:
-                    old_backup.unlink()
+        """Create a backup of the expenses file right away."""
+        self.backups.wait()
+        with self._locked():
+            job = self._backup_job()
+        self.backups.start(job, background=False)
+        if self.backups.error:
+            error, self.backups.error = self.backups.error, None
+            raise error
+    
+    def _schedule_backup(self) -> None:
+        """Note a ledger change and start an automatic backup if one is due."""
+        if not self.config.get('auto_backup', True):
+            return
+        self.backups.changed()
+        if self.backups.due():
+            self.backups.start(self._backup_job())
+    
+    def _backup_job(self):
+        """Capture the ledger as it is now and return the job that copies it into a backup."""
+        now = datetime.now()
+        stem = f"expenses_backup_{now.strftime('%Y%m%d_%H%M%S')}"
+        compression = resolve(self.config.get('backup_compression', 'none'))
+        if self.store:
+            def job() -> None:
+                path = BACKUP_DIR / f"{stem}.db"
+                self.store.backup_to(path)
+                if compression == 'none':
+                    files = [file_digest(path, DATABASE_FILE.name)]
+                else:
+                    target = self._backup_path(stem, DATABASE_FILE.name, compression)
+                    files = copy_captured([capture(path, target, DATABASE_FILE.name)], compression)
+                    path.unlink()
+                self._record_backup(BackupRecord(stem, 'sqlite', now.timestamp(), files, compression))
+            return job
+        
+        # The journal belongs to the base file, so both are captured together
+        captured = [capture(path, self._backup_path(stem, path.name, compression))
+                    for path in (EXPENSES_FILE, JOURNAL_FILE)]
+        captured = [file for file in captured if file is not None]
+        
+        if self.config.get('backup_mode', 'full') == 'incremental':
+            def job() -> None:
+                files = store_captured(self.chunk_store, stem, captured, compression)
+                self._record_backup(BackupRecord(stem, 'incremental', now.timestamp(), files, compression))
+            return job
+        
+        def job() -> None:
+            files = copy_captured(captured, compression)
+            self._record_backup(BackupRecord(stem, 'full', now.timestamp(), files, compression))
+        return job
+    
+    def _record_backup(self, record: BackupRecord) -> None:
+        """Add a finished backup to the catalog and prune the ones retention no longer keeps."""
+        self.backup_catalog.add(record)
+        # Retention applies to the ledger's own backups, not to those of the other storage backend
+        family = ['sqlite'] if record.kind == 'sqlite' else ['full', 'incremental']
+        expired = expired_backups(self.backup_catalog.backups(family),
+                                  self.config.get('backup_keep', 10),
+                                  self.config.get('backup_retention', DEFAULT_RETENTION))
+        if not expired:
+            return
+        
+        # Forget backups before deleting them, so the catalog never lists a missing file
+        self.backup_catalog.remove(old.name for old in expired)
+        for old in expired:
+            if old.kind != 'incremental':
+                for entry in old.files:
+                    remove_file(self._backup_path(old.name, entry["name"], old.compression))
+        incremental = [old.name for old in expired if old.kind == 'incremental']
+        if incremental:
+            self.chunk_store.remove(incremental)
+    
+    def _backup_path(self, name: str, data_file: str, compression: str = 'none') -> Path:
+        """Return where a full backup keeps its copy of a data file."""
+        return BACKUP_DIR / f"{name}{Path(data_file).suffix}{SUFFIXES[compression]}"
+    
+    def _backup_kinds(self) -> List[str]:
+        """Return the kinds of backup the current storage backend can restore."""
+        return ['sqlite'] if self.store else ['full', 'incremental']
+    
+    def _load_backup_catalog(self) -> None:
+        """Load the backup catalog, recording backups taken before it existed."""
+        self.backup_catalog.load()
+        if self.backup_catalog.exists or self.read_only:
+            return
+        
+        records = []
+        for path in BACKUP_DIR.glob("expenses_backup_*.csv"):
+            files = [file_digest(path, EXPENSES_FILE.name)]
+            if path.with_suffix('.journal').exists():
+                files.append(file_digest(path.with_suffix('.journal'), JOURNAL_FILE.name))
+            records.append(BackupRecord(path.stem, 'full', self._backup_time(path), files))
+        for path in BACKUP_DIR.glob("expenses_backup_*.db"):
+            records.append(BackupRecord(path.stem, 'sqlite', self._backup_time(path),
+                                        [file_digest(path, DATABASE_FILE.name)]))
+        for path in self.chunk_store.manifest_dir.glob("*.json"):
+            files = [{key: entry[key] for key in ("name", "size", "sha256")}
+                     for entry in self.chunk_store.manifest(path.stem)["files"]]
+            records.append(BackupRecord(path.stem, 'incremental', self._backup_time(path), files))
+        self.backup_catalog.add_many(records)
+    
+    def _backup_time(self, path: Path) -> float:
+        """Return when an uncatalogued backup was taken, from its name if possible."""
+        try:
+            return datetime.strptime(path.stem, "expenses_backup_%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            return path.stat().st_mtime
+    
+    def list_backups(self) -> List[BackupRecord]:
+        """Return the backups that can be restored, oldest first."""
+        return self.backup_catalog.backups(self._backup_kinds())
+    
+    def find_backup(self, when: datetime) -> Optional[BackupRecord]:
+        """Return the most recent restorable backup taken at or before a time."""
+        taken = [record for record in self.list_backups() if record.created <= when.timestamp()]
+        return taken[-1] if taken else None
+    
+    def restore_backup(self, name: str) -> bool:
+        """Replace the ledger with a backup and reload it.
+        
+        Returns False if there is no such backup. Raises ValueError if the
+        backup no longer matches the checksums recorded when it was taken.
+        """
+        record = self.backup_catalog.records.get(name)
+        if self.read_only or record is None or record.kind not in self._backup_kinds():
+            return False
+        self.backups.wait()
+        
+        with self._transaction():
+            if self.store:
+                self.store.close()
+                restore_file(self._backup_path(name, DATABASE_FILE.name, record.compression), DATABASE_FILE,
+                             record.files[0]["sha256"])
+                self._open_store()
+            elif record.kind == 'incremental':
+                self.chunk_store.restore(name, DATA_DIR)
+            else:
+                for entry in record.files:
+                    restore_file(self._backup_path(name, entry["name"], record.compression),
+                                 DATA_DIR / entry["name"], entry["sha256"])
+            # A journal written after the backup does not belong to the restored base file
+            if not self.store and JOURNAL_FILE.name not in {entry["name"] for entry in record.files}:
+                remove_file(JOURNAL_FILE)
+            self.load_expenses()
+        return True
     
     def validate_date(self, date_str: str) -> bool:
         """Validate date format."""
@@ -170,98 +811,362 @@ class ExpenseManager:
         """Validate amount format and value."""
         try:
             amount = Decimal(amount_str)
-            return amount > 0
-        except (ValueError, TypeError):
+            if not (amount.is_finite() and amount > 0):
+                return False
+            # Amounts with more digits than the decimal context holds cannot be rounded
+            self.quantize_amount(amount)
+            return True
+        except (ValueError, TypeError, InvalidOperation):
             return False
     
+    def quantize_amount(self, amount: Decimal) -> Decimal:
+        """Round an amount to the minor unit of the configured currency."""
+        return quantize(amount, self._decimal_places())
+    
+    def total_amount(self, expenses) -> Decimal:
+        """Sum the amounts of expenses in integer minor units."""
+        places = self._decimal_places()
+        if expenses is self.expenses and self._vectorized:
+            return from_minor(total_units(expenses), expenses.decimal_places)
+        if expenses is self.expenses and isinstance(expenses, ColumnarLedger):
+            return from_minor(sum(expenses.amounts), expenses.decimal_places)
+        return from_minor(sum(to_minor(e.amount, places) for e in expenses), places)
+    
     def add_expense(self, date_str: str, category: str, amount: Decimal, description: str = "") -> bool:
         """Add a new expense."""
+        if self.read_only:
+            return False
         if not self.validate_date(date_str):
             return False
         
         if not self.validate_amount(str(amount)):
             return False
+        amount = self.quantize_amount(Decimal(str(amount)))
+        if amount <= 0:
+            return False
         
         expense = Expense(date_str, category.lower().strip(), amount, description.strip())
-        self.expenses.append(expense)
-        self.save_expenses()
         
-        # Auto backup if enabled
-        if self.config.get('auto_backup', True):
-            self.backup_data()
+        # New rows are appended in place; edits and deletes rewrite the file unless journaled
+        write_mode = self._write_mode()
+        with self._transaction():
+            if self.store:
+                try:
+                    self.store.add_many([expense])
+                except ValueError:
+                    return False
+            elif self._streaming:
+                self._commit_streaming({'op': 'add', 'row': expense.to_dict()})
+            else:
+                try:
+                    self.expenses.append(expense)
+                except ValueError:
+                    return False
+                if self.index is not None:
+                    self.index.add(expense)
+                if write_mode == 'journal':
+                    self._log_operations({'op': 'add', 'row': expense.to_dict()})
+                elif write_mode == 'append':
+                    self._append_expenses([expense])
+                else:
+                    self.save_expenses()
+            
+            # Auto backup if enabled
+            self._schedule_backup()
         
         # Check budget warning
         self._check_budget_warning(expense)
         
         return True
     
-    def edit_expense(self, index: int, date_str: str, category: str, amount: Decimal, description: str = "") -> bool:
-        """Edit an existing expense."""
-        if not (0 <= index < len(self.expenses)):
+    def add_expenses(self, expenses: List[Expense]) -> int:
+        """Add already validated expenses with one write and at most one backup.
+        
+        Returns how many expenses were added; none are added if the ledger
+        cannot hold all of them.
+        """
+        if self.read_only or not expenses:
+            return 0
+        
+        write_mode = self._write_mode()
+        with self._transaction():
+            if self.store:
+                try:
+                    self.store.add_many(expenses)
+                except ValueError:
+                    return 0
+            elif self._streaming:
+                self._commit_streaming(*({'op': 'add', 'row': expense.to_dict()} for expense in expenses))
+            else:
+                if isinstance(self.expenses, ColumnarLedger):
+                    # Encode the whole batch first so a rejected row leaves the ledger untouched
+                    try:
+                        batch = ColumnarLedger(Expense, self.expenses.decimal_places, expenses)
+                    except ValueError:
+                        return 0
+                    self.expenses.extend_ledger(batch)
+                else:
+                    self.expenses.extend(expenses)
+                if self.index is not None:
+                    for expense in expenses:
+                        self.index.add(expense)
+                if write_mode == 'journal':
+                    self._log_operations(*({'op': 'add', 'row': expense.to_dict()} for expense in expenses))
+                elif write_mode == 'append':
+                    self._append_expenses(expenses)
+                else:
+                    self.save_expenses()
+            
+            self._schedule_backup()
+        
+        # Warn once per month and category rather than once per row
+        latest = {(expense.date[:7], expense.category): expense for expense in expenses}
+        for expense in latest.values():
+            self._check_budget_warning(expense)
+        
+        return len(expenses)
+    
+    def read_import(self, filepath: str) -> Tuple[List[Expense], List[Tuple[int, str]]]:
+        """Validate every row of a CSV file laid out like the exports, plain or compressed.
+        
+        Returns the expenses built from valid rows and the line number and
+        reason of each rejected row.
+        """
+        expenses = []
+        errors = []
+        columnar = isinstance(self.expenses, ColumnarLedger)
+        batch = ColumnarLedger(Expense, self._decimal_places()) if columnar else None
+        
+        with open_text_reader(filepath, encoding='utf-8-sig') as file:
+            reader = csv.DictReader(file)
+            missing = [name for name in ('date', 'category', 'amount') if name not in (reader.fieldnames or [])]
+            if missing:
+                return [], [(1, f"missing column(s): {', '.join(missing)}")]
+            
+            for row in reader:
+                line = reader.line_num
+                date_str = (row['date'] or '').strip()
+                category = (row['category'] or '').lower().strip()
+                amount_str = (row['amount'] or '').strip()
+                if not self.validate_date(date_str):
+                    errors.append((line, f"invalid date {date_str!r}"))
+                    continue
+                if not category:
+                    errors.append((line, "missing category"))
+                    continue
+                if not self.validate_amount(amount_str):
+                    errors.append((line, f"invalid amount {amount_str!r}"))
+                    continue
+                amount = self.quantize_amount(Decimal(amount_str))
+                if amount <= 0:
+                    errors.append((line, f"amount {amount_str} rounds to zero"))
+                    continue
+                
+                expense = Expense(date_str, category, amount, (row.get('description') or '').strip())
+                if batch is not None:
+                    try:
+                        batch.append(expense)
+                    except ValueError as error:
+                        errors.append((line, str(error)))
+                        continue
+                elif self.store:
+                    try:
+                        to_units(amount)
+                    except ValueError as error:
+                        errors.append((line, str(error)))
+                        continue
+                expenses.append(expense)
+        return expenses, errors
+    
+    def import_expenses(self, filepath: str) -> ImportResult:
+        """Import the valid rows of a CSV file in a single commit."""
+        expenses, errors = self.read_import(filepath)
+        return ImportResult(self.add_expenses(expenses), errors)
+    
+    def edit_expense(self, index: int, date_str: str, category: str, amount: Decimal, description: str = "",
+                     expected: Optional[Expense] = None) -> bool:
+        """Edit an existing expense.
+        
+        expected is the expense the caller saw at index, by default this
+        session's copy when the ledger is held in memory. If another process
+        has changed the ledger since, the expense is found again by value;
+        False is returned if it is gone.
+        """
+        if self.read_only:
             return False
+        if expected is None:
+            expected = self._held_copy(index)
         
         if not self.validate_date(date_str) or not self.validate_amount(str(amount)):
             return False
+        amount = self.quantize_amount(Decimal(str(amount)))
+        if amount <= 0:
+            return False
         
-        self.expenses[index] = Expense(date_str, category.lower().strip(), amount, description.strip())
-        self.save_expenses()
+        expense = Expense(date_str, category.lower().strip(), amount, description.strip())
+        with self._transaction():
+            index = self._locate(index, expected)
+            if index < 0:
+                return False
+            if self.store:
+                try:
+                    if not self.store.replace(index, expense):
+                        return False
+                except ValueError:
+                    return False
+            elif self._streaming:
+                self._commit_streaming({'op': 'edit', 'index': index, 'row': expense.to_dict()})
+            else:
+                previous = self.expenses[index]
+                try:
+                    self.expenses[index] = expense
+                except ValueError:
+                    return False
+                if self.index is not None:
+                    self.index.replace(previous, expense)
+                if self._write_mode() == 'journal':
+                    self._log_operations({'op': 'edit', 'index': index, 'row': expense.to_dict()})
+                else:
+                    self.save_expenses()
+            
+            self._schedule_backup()
         return True
     
-    def delete_expense(self, index: int) -> bool:
-        """Delete an expense by index."""
-        if 0 <= index < len(self.expenses):
-            del self.expenses[index]
-            self.save_expenses()
-            return True
-        return False
+    def delete_expense(self, index: int, expected: Optional[Expense] = None) -> bool:
+        """Delete an expense by index, matching it by value like edit_expense."""
+        if self.read_only:
+            return False
+        if expected is None:
+            expected = self._held_copy(index)
+        
+        with self._transaction():
+            index = self._locate(index, expected)
+            if index < 0:
+                return False
+            if self.store:
+                if not self.store.delete(index):
+                    return False
+            elif self._streaming:
+                self._commit_streaming({'op': 'delete', 'index': index})
+            else:
+                if self.index is not None:
+                    self.index.remove(self.expenses[index])
+                del self.expenses[index]
+                
+                if self._write_mode() == 'journal':
+                    self._log_operations({'op': 'delete', 'index': index})
+                else:
+                    self.save_expenses()
+            
+            self._schedule_backup()
+        return True
+    
+    def _held_copy(self, index: int) -> Optional[Expense]:
+        """Return this session's in-memory copy of the expense at index, if it holds one."""
+        # Streamed and SQLite ledgers read the files, which only match this session's view
+        # under the lock; their rows are looked up inside the transaction instead
+        if self.store or self._streaming or not 0 <= index < len(self.expenses):
+            return None
+        return self.expenses[index]
+    
+    def _locate(self, index: int, expected: Optional[Expense]) -> int:
+        """Return where the expense a caller saw at index is now, or -1 if it is gone."""
+        if 0 <= index < len(self.expenses) and (expected is None or self.expenses[index] == expected):
+            return index
+        if expected is None:
+            return -1
+        # Rows shift when other sessions delete; take the nearest identical row
+        matches = [position for position, expense in enumerate(self.expenses) if expense == expected]
+        return min(matches, key=lambda position: abs(position - index), default=-1)
     
     def search_expenses(self, keyword: str = "", category: str = "", start_date: str = "", end_date: str = "", min_amount: str = "", max_amount: str = "") -> List[Expense]:
         """Search expenses with multiple filters."""
-        filtered_expenses = self.expenses.copy()
+        if self.store:
+            return self.store.search(keyword, category, start_date, end_date, min_amount, max_amount,
+                                     self.config.get('keyword_search', 'substring'))
         
-        if keyword:
-            filtered_expenses = [e for e in filtered_expenses if keyword.lower() in e.description.lower() or keyword.lower() in e.category.lower()]
-        
-        if category:
-            filtered_expenses = [e for e in filtered_expenses if e.category.lower() == category.lower()]
-        
-        if start_date:
-            filtered_expenses = [e for e in filtered_expenses if e.date >= start_date]
-        
-        if end_date:
-            filtered_expenses = [e for e in filtered_expenses if e.date <= end_date]
+        query = SearchQuery.from_strings(keyword, category, start_date, end_date, min_amount, max_amount,
+                                         keyword_mode=self.config.get('keyword_search', 'substring'))
+        if self._vectorized:
+            return self.expenses.rows(search_positions(self.expenses, query))
+        return run_search(query, self.index, self.expenses)
+    
+    def iter_expenses(self, keyword: str = "", category: str = "", start_date: str = "", end_date: str = "", min_amount: str = "", max_amount: str = "") -> Iterator[Expense]:
+        """Yield expenses matching the filters one at a time.
         
-        if min_amount:
-            min_amt = Decimal(min_amount)
-            filtered_expenses = [e for e in filtered_expenses if e.amount >= min_amt]
+        With preload disabled the rows are streamed from disk, so memory use
+        stays bounded regardless of the ledger size.
+        """
+        if self.store:
+            yield from self.store.iter_search(keyword, category, start_date, end_date, min_amount, max_amount,
+                                              self.config.get('keyword_search', 'substring'))
+            return
         
-        if max_amount:
-            max_amt = Decimal(max_amount)
-            filtered_expenses = [e for e in filtered_expenses if e.amount <= max_amt]
+        query = SearchQuery.from_strings(keyword, category, start_date, end_date, min_amount, max_amount,
+                                         keyword_mode=self.config.get('keyword_search', 'substring'))
+        if self.index is not None:
+            yield from run_search(query, self.index, self.expenses)
+            return
+        if self._vectorized:
+            for position in search_positions(self.expenses, query):
+                yield self.expenses[position]
+            return
         
-        return filtered_expenses
+        predicate = query.predicate()
+        for expense in self.expenses:
+            if predicate is None or predicate(expense):
+                yield expense
     
     def get_monthly_report(self, month: str) -> Dict:
         """Generate monthly expense report."""
-        monthly_expenses = [e for e in self.expenses if e.date.startswith(month)]
-        
-        if not monthly_expenses:
-            return {"total": Decimal("0"), "categories": {}, "expenses": []}
-        
-        total = sum(e.amount for e in monthly_expenses)
-        categories = {}
+        report = self._summarize_month(month)
+        report["budget_status"] = self._get_budget_status(month, report["categories"])
+        return report
+    
+    def _month_expenses(self, month: str):
+        """Return the expenses of a month, in ledger order."""
+        if self.store:
+            return self.store.month_expenses(month)
+        if self.index is not None:
+            return self.index.month(month)
+        if self._vectorized and len(month) == 7:
+            return self.expenses.rows(month_positions(self.expenses, month))
+        if isinstance(self.expenses, ColumnarLedger) and len(month) == 7:
+            return self.expenses.month_rows(month)
+        return (e for e in self.expenses if e.date.startswith(month))
+    
+    def _summarize_month(self, month: str) -> Dict:
+        """Compute total and category breakdown for a month in a single pass."""
+        if self.index is not None and len(month) == 7:
+            # Whole months are answered from the running totals
+            return {
+                "total": self.index.month_total(month),
+                "categories": self.index.category_totals(month),
+                "expenses": self.index.month(month)
+            }
         
-        for expense in monthly_expenses:
-            if expense.category in categories:
-                categories[expense.category] += expense.amount
-            else:
-                categories[expense.category] = expense.amount
+        places = self._decimal_places()
+        if self._vectorized and len(month) == 7:
+            units_by_category = month_totals(self.expenses, month)
+            places = self.expenses.decimal_places
+            monthly_expenses = self._month_expenses(month)
+        elif isinstance(self.expenses, ColumnarLedger) and len(month) == 7:
+            units_by_category = self.expenses.month_totals(month)
+            places = self.expenses.decimal_places
+            monthly_expenses = self.expenses.month_rows(month)
+        else:
+            # Sum integer minor units and convert to Decimal once per total
+            monthly_expenses = []
+            units_by_category = {}
+            for expense in self._month_expenses(month):
+                monthly_expenses.append(expense)
+                units = to_minor(expense.amount, places)
+                units_by_category[expense.category] = units_by_category.get(expense.category, 0) + units
         
         return {
-            "total": total,
-            "categories": categories,
-            "expenses": monthly_expenses,
-            "budget_status": self._get_budget_status(month)
+            "total": from_minor(sum(units_by_category.values()), places),
+            "categories": {category: from_minor(units, places) for category, units in units_by_category.items()},
+            "expenses": monthly_expenses
         }
     
     def set_budget(self, month: str, category: str, limit: Decimal) -> None:
@@ -275,17 +1180,27 @@ class ExpenseManager:
         self.config["budgets"][month][category] = str(limit)
         self.save_config()
     
-    def _get_budget_status(self, month: str) -> Dict:
-        """Get budget status for a month."""
+    def get_budget_status(self, month: str) -> Dict:
+        """Return the limit, spending and remainder of every budgeted category in a month."""
+        return self._get_budget_status(month)
+    
+    def _get_budget_status(self, month: str, spent_by_category: Optional[Dict[str, Decimal]] = None) -> Dict:
+        """Get budget status for a month from its category totals."""
         if "budgets" not in self.config or month not in self.config["budgets"]:
             return {}
         
-        monthly_expenses = self.get_monthly_report(month)
+        if spent_by_category is None:
+            if self.store:
+                spent_by_category = self.store.category_totals(month)
+            elif self.index is not None and len(month) == 7:
+                spent_by_category = self.index.category_totals(month)
+            else:
+                spent_by_category = self._summarize_month(month)["categories"]
         budget_status = {}
         
         for category, limit_str in self.config["budgets"][month].items():
             limit = Decimal(limit_str)
-            spent = monthly_expenses["categories"].get(category, Decimal("0"))
+            spent = spent_by_category.get(category, Decimal("0"))
             remaining = limit - spent
             percentage = (spent / limit * 100) if limit > 0 else 0
             
@@ -306,7 +1221,17 @@ class ExpenseManager:
         
         if expense.category in self.config["budgets"][month]:
             limit = Decimal(self.config["budgets"][month][expense.category])
-            month_total = sum(e.amount for e in self.expenses if e.date.startswith(month) and e.category == expense.category)
+            if self.store:
+                month_total = self.store.category_total(month, expense.category)
+            elif self.index is not None:
+                month_total = self.index.category_total(month, expense.category)
+            elif self._vectorized:
+                month_total = from_minor(category_units(self.expenses, month, expense.category),
+                                         self.expenses.decimal_places)
+            elif isinstance(self.expenses, ColumnarLedger):
+                month_total = self.expenses.category_total(month, expense.category)
+            else:
+                month_total = self.total_amount(e for e in self._month_expenses(month) if e.category == expense.category)
             
             if month_total > limit:
                 if RICH_AVAILABLE:
@@ -316,17 +1241,22 @@ class ExpenseManager:
     
     def get_category_suggestions(self) -> List[str]:
         """Get category suggestions based on past entries and config."""
-        used_categories = set(e.category for e in self.expenses)
+        if self.store:
+            used_categories = set(self.store.categories())
+        elif isinstance(self.expenses, ColumnarLedger):
+            used_categories = set(self.expenses.used_categories())
+        else:
+            used_categories = set(e.category for e in self.expenses)
         config_categories = set(self.config.get("categories", DEFAULT_CATEGORIES))
         return sorted(list(used_categories.union(config_categories)))
     
     def export_to_csv(self, filepath: str, expenses: List[Expense] = None) -> bool:
-        """Export expenses to a CSV file."""
+        """Export expenses to a CSV file, compressed if its name ends in .gz or .zst."""
         if expenses is None:
             expenses = self.expenses
         
         try:
-            with open(filepath, 'w', newline='', encoding='utf-8') as file:
+            with io.TextIOWrapper(open_writer(filepath, compression_for(filepath)), encoding='utf-8', newline='') as file:
                 writer = csv.DictWriter(file, fieldnames=['date', 'category', 'amount', 'description'])
                 writer.writeheader()
                 for expense in expenses:
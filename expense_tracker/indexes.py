@@ -0,0 +1,300 @@
+"""
+In-memory indexes over the expense ledger.
+Kept up to date by ExpenseManager so month-scoped queries avoid full scans.
+"""
+
+import heapq
+import math
+import re
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from money import DEFAULT_DECIMAL_PLACES, from_minor, to_minor
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def month_key(date_str: str) -> str:
+    """Return the YYYY-MM partition key of a date string."""
+    return date_str[:7]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def keyword_terms(keyword: str, mode: str = "substring") -> List[Callable[[str], bool]]:
+    """Return the per-text tests a keyword is made of.
+
+    An expense matches when every test accepts its description or its
+    category. An empty list means the keyword has no words and matches nothing.
+    """
+    if mode == "substring":
+        needle = keyword.lower()
+        return [lambda text: needle in text.lower()]
+    if mode == "prefix":
+        return [
+            lambda text, word=word: any(token.startswith(word) for token in tokenize(text))
+            for word in tokenize(keyword)
+        ]
+    return [lambda text, word=word: word in tokenize(text) for word in tokenize(keyword)]
+
+
+def keyword_predicate(keyword: str, mode: str = "substring") -> Callable[[object], bool]:
+    """Return a per-expense test equivalent to ExpenseIndex.keyword_matches."""
+    terms = keyword_terms(keyword, mode)
+    return lambda e: bool(terms) and all(term(e.description) or term(e.category) for term in terms)
+
+
+class ExpenseIndex:
+    """Month-partitioned index over a list of expenses.
+
+    Every indexed expense gets a sequence number reflecting its position in
+    the ledger, so partitions can be kept in ledger order as rows are added,
+    edited and deleted. Expenses are tracked by identity. Running totals per
+    month and category in integer minor units, a date-sorted view for range
+    queries and an inverted index over description and category words and
+    per-category postings are maintained alongside the partitions.
+    """
+
+    def __init__(self, decimal_places: int = DEFAULT_DECIMAL_PLACES):
+        self.decimal_places = decimal_places
+        self._seq: Dict[int, int] = {}
+        self._next_seq = 0
+        # month -> (sequence numbers, expenses), both in ledger order
+        self._months: Dict[str, Tuple[List[int], List]] = {}
+        # month -> category -> [total in minor units, count]
+        self._rollup: Dict[str, Dict[str, List]] = {}
+        # (date, sequence number) keys in sorted order, with the matching expenses
+        self._date_keys: List[Tuple[str, int]] = []
+        self._date_rows: List = []
+        # token -> {sequence number: expense}, plus the sorted vocabulary for prefix lookups
+        self._postings: Dict[str, Dict[int, object]] = {}
+        self._vocabulary: List[str] = []
+        # lowercase category -> {sequence number: expense}
+        self._categories: Dict[str, Dict[int, object]] = {}
+
+    def __len__(self) -> int:
+        return len(self._seq)
+
+    def rebuild(self, expenses: Iterable) -> None:
+        """Index a freshly loaded ledger from scratch."""
+        self._seq = {}
+        self._next_seq = 0
+        self._months = {}
+        self._rollup = {}
+        self._date_keys = []
+        self._date_rows = []
+        self._postings = {}
+        self._vocabulary = []
+        self._categories = {}
+        for expense in expenses:
+            self.add(expense)
+
+    def add(self, expense) -> None:
+        """Index an expense appended to the end of the ledger."""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._seq[id(expense)] = seq
+        seqs, rows = self._months.setdefault(month_key(expense.date), ([], []))
+        seqs.append(seq)
+        rows.append(expense)
+        self._count(expense, 1)
+        self._insert_date(expense, seq)
+        self._insert_tokens(expense, seq)
+
+    def replace(self, old, new) -> None:
+        """Swap an edited expense in at the position of the old one."""
+        seq = self._seq.pop(id(old))
+        self._unlink(old, seq)
+        self._seq[id(new)] = seq
+        seqs, rows = self._months.setdefault(month_key(new.date), ([], []))
+        position = bisect_left(seqs, seq)
+        seqs.insert(position, seq)
+        rows.insert(position, new)
+        self._count(new, 1)
+        self._insert_date(new, seq)
+        self._insert_tokens(new, seq)
+
+    def remove(self, expense) -> None:
+        """Drop a deleted expense from the index."""
+        self._unlink(expense, self._seq.pop(id(expense)))
+
+    def _unlink(self, expense, seq: int) -> None:
+        """Remove an expense from its month partition."""
+        key = month_key(expense.date)
+        seqs, rows = self._months[key]
+        position = bisect_left(seqs, seq)
+        del seqs[position]
+        del rows[position]
+        if not seqs:
+            del self._months[key]
+        self._count(expense, -1)
+        position = bisect_left(self._date_keys, (expense.date, seq))
+        del self._date_keys[position]
+        del self._date_rows[position]
+        for token in self._tokens(expense):
+            postings = self._postings[token]
+            del postings[seq]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+        category = expense.category.lower()
+        del self._categories[category][seq]
+        if not self._categories[category]:
+            del self._categories[category]
+
+    def _insert_date(self, expense, seq: int) -> None:
+        """Insert an expense into the date-sorted view."""
+        key = (expense.date, seq)
+        position = bisect_left(self._date_keys, key)
+        self._date_keys.insert(position, key)
+        self._date_rows.insert(position, expense)
+
+    @staticmethod
+    def _tokens(expense) -> set:
+        """Return the distinct searchable tokens of an expense."""
+        return set(tokenize(expense.description)) | set(tokenize(expense.category))
+
+    def _insert_tokens(self, expense, seq: int) -> None:
+        """Add an expense to the postings of its tokens and category."""
+        self._categories.setdefault(expense.category.lower(), {})[seq] = expense
+        for token in self._tokens(expense):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+            postings[seq] = expense
+
+    def _count(self, expense, sign: int) -> None:
+        """Add or subtract an expense from the month and category totals."""
+        categories = self._rollup.setdefault(month_key(expense.date), {})
+        totals = categories.setdefault(expense.category, [0, 0])
+        totals[0] += sign * to_minor(expense.amount, self.decimal_places)
+        totals[1] += sign
+        if totals[1] == 0:
+            del categories[expense.category]
+            if not categories:
+                del self._rollup[month_key(expense.date)]
+
+    def category_totals(self, month: str) -> Dict[str, Decimal]:
+        """Return spending per category for a YYYY-MM month."""
+        return {
+            category: from_minor(totals[0], self.decimal_places)
+            for category, totals in self._rollup.get(month, {}).items()
+        }
+
+    def month_total(self, month: str) -> Decimal:
+        """Return total spending for a YYYY-MM month."""
+        units = sum(totals[0] for totals in self._rollup.get(month, {}).values())
+        return from_minor(units, self.decimal_places)
+
+    def category_total(self, month: str, category: str) -> Decimal:
+        """Return spending for one category in a YYYY-MM month."""
+        return from_minor(self._rollup.get(month, {}).get(category, [0])[0], self.decimal_places)
+
+    def month(self, month: str) -> List:
+        """Return the expenses whose date starts with month, in ledger order."""
+        if len(month) >= 7:
+            seqs, rows = self._months.get(month[:7], ([], []))
+            if len(month) == 7:
+                return list(rows)
+            return [e for e in rows if e.date.startswith(month)]
+
+        # Shorter prefixes such as a year span several partitions
+        partitions = [
+            zip(seqs, rows) for key, (seqs, rows) in self._months.items() if key.startswith(month)
+        ]
+        return [expense for _, expense in heapq.merge(*partitions, key=lambda item: item[0])]
+
+    def _date_bounds(self, start_date: str, end_date: str) -> Tuple[int, int]:
+        """Return the slice of the date-sorted view within the bounds."""
+        low = bisect_left(self._date_keys, (start_date,)) if start_date else 0
+        high = bisect_right(self._date_keys, (end_date, math.inf)) if end_date else len(self._date_keys)
+        return low, max(low, high)
+
+    def count_date_range(self, start_date: str = "", end_date: str = "") -> int:
+        """Return how many expenses fall within a date range."""
+        low, high = self._date_bounds(start_date, end_date)
+        return high - low
+
+    def date_range(self, start_date: str = "", end_date: str = "") -> List:
+        """Return expenses with start_date <= date <= end_date, in ledger order.
+
+        Either bound may be empty. Bounds compare as strings, like the
+        unindexed filters they replace.
+        """
+        low, high = self._date_bounds(start_date, end_date)
+        if low >= high:
+            return []
+        matches = sorted(zip(self._date_keys[low:high], self._date_rows[low:high]), key=lambda item: item[0][1])
+        return [expense for _, expense in matches]
+
+    def keyword_matches(self, keyword: str, mode: str = "substring") -> Optional[List]:
+        """Return expenses matching a keyword in their description or category.
+
+        "substring" matches like a plain substring test, "word" requires every
+        word of the keyword to appear as a whole word and "prefix" requires
+        every word to start some word. Results are in ledger order. Returns
+        None when a substring keyword spans word boundaries and the index
+        cannot answer it.
+        """
+        if mode == "substring":
+            needle = keyword.lower()
+            if not TOKEN_PATTERN.fullmatch(needle):
+                return None
+            # A run of word characters can only occur inside a single token
+            matches = {}
+            for token, postings in self._postings.items():
+                if needle in token:
+                    matches.update(postings)
+            return [matches[seq] for seq in sorted(matches)]
+
+        matches = None
+        for word in tokenize(keyword):
+            if mode == "prefix":
+                word_matches = {}
+                position = bisect_left(self._vocabulary, word)
+                while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+                    word_matches.update(self._postings[self._vocabulary[position]])
+                    position += 1
+            else:
+                word_matches = self._postings.get(word, {})
+            matches = dict(word_matches) if matches is None else {
+                seq: expense for seq, expense in matches.items() if seq in word_matches
+            }
+            if not matches:
+                return []
+        return [matches[seq] for seq in sorted(matches or {})]
+
+    def count_category(self, category: str) -> int:
+        """Return how many expenses have a category, ignoring case."""
+        return len(self._categories.get(category.lower(), {}))
+
+    def category_rows(self, category: str) -> List:
+        """Return the expenses of a category, ignoring case, in ledger order."""
+        postings = self._categories.get(category.lower(), {})
+        return [postings[seq] for seq in sorted(postings)]
+
+    def estimate_keyword(self, keyword: str, mode: str = "substring") -> Optional[int]:
+        """Return an upper bound on keyword matches, or None if not indexable."""
+        if mode == "substring":
+            needle = keyword.lower()
+            if not TOKEN_PATTERN.fullmatch(needle):
+                return None
+            return sum(len(postings) for token, postings in self._postings.items() if needle in token)
+
+        estimate = len(self._seq)
+        for word in tokenize(keyword):
+            if mode == "prefix":
+                count = 0
+                position = bisect_left(self._vocabulary, word)
+                while position < len(self._vocabulary) and self._vocabulary[position].startswith(word):
+                    count += len(self._postings[self._vocabulary[position]])
+                    position += 1
+            else:
+                count = len(self._postings.get(word, {}))
+            estimate = min(estimate, count)
+        return estimate
@@ -0,0 +1,61 @@
+"""
+Cross-process coordination for a shared data directory.
+Every process that changes the ledger holds an advisory lock on
+data/expenses.lock while it writes, and the lock file carries a generation
+counter bumped by each commit, so a process can tell that its in-memory copy
+of the ledger is out of date before it writes over someone else's rows.
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+try:
+    import fcntl
+    LOCKING_AVAILABLE = True
+except ImportError:
+    # Windows has no fcntl; sessions there still see the generation counter
+    fcntl = None
+    LOCKING_AVAILABLE = False
+
+
+class LedgerLock:
+    """Re-entrant advisory lock on the ledger with a generation counter.
+
+    Nested acquisitions within one process share the outer lock, so a
+    commit can reload the ledger without releasing it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file: Optional[BinaryIO] = None
+        self._depth = 0
+
+    def __enter__(self) -> "LedgerLock":
+        if self._depth == 0:
+            self._file = open(self.path, 'a+b')
+            if LOCKING_AVAILABLE:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            # Closing the file releases the lock
+            self._file.close()
+            self._file = None
+
+    def generation(self) -> int:
+        """Return the number of commits recorded so far. Requires the lock."""
+        self._file.seek(0)
+        content = self._file.read().strip()
+        return int(content) if content.isdigit() else 0
+
+    def bump(self) -> int:
+        """Record a commit and return the new generation. Requires the lock."""
+        generation = self.generation() + 1
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(generation).encode('ascii'))
+        self._file.flush()
+        return generation
@@ -5,6 +5,10 @@ A professional-grade command-line expense management system.
 
 Usage:
     python main.py
+    python main.py --import statement.csv
+    python main.py --list-backups
+    python main.py --restore expenses_backup_20240101_120000
+    python main.py --restore "2024-01-31 18:00"
 
 Requirements:
     pip install rich
@@ -13,8 +17,10 @@ Author: Enhanced by Claude
 Version: 2.0.0
 """
 
+import argparse
 import sys
 import os
+from datetime import datetime
 from pathlib import Path
 
 # Add the current directory to Python path so modules can be imported
@@ -22,6 +28,7 @@ sys.path.append(str(Path(__file__).parent))
 
 try:
     from enhanced_ui import ExpenseUI
+    from expense_manager import ExpenseManager
 except ImportError as e:
     print(f"Error importing modules: {e}")
     print("Make sure all files are in the same directory:")
@@ -47,8 +54,80 @@ def check_dependencies():
         input("Press Enter to continue with basic mode...")
         return False
 
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Personal Expense Tracker Pro")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="import expenses from a CSV file with date, category, amount "
+                             "and description columns, then exit")
+    parser.add_argument("--list-backups", action="store_true",
+                        help="list the backups that can be restored, then exit")
+    parser.add_argument("--restore", metavar="NAME",
+                        help="replace the ledger with the named backup, or with the last one taken "
+                             "at or before a YYYY-MM-DD[ HH:MM] time, then exit")
+    return parser.parse_args(argv)
+
+def import_file(filepath):
+    """Import a CSV file without starting the interactive UI."""
+    manager = ExpenseManager()
+    try:
+        result = manager.import_expenses(filepath)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read {filepath}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        manager.close()
+    
+    for line, reason in result.errors:
+        print(f"Line {line}: {reason}", file=sys.stderr)
+    print(f"Imported {result.imported} expenses, rejected {len(result.errors)} rows.")
+    return 1 if result.errors else 0
+
+def list_backups():
+    """Print the restorable backups, oldest first."""
+    manager = ExpenseManager(load=False)
+    try:
+        for record in manager.list_backups():
+            created = datetime.fromtimestamp(record.created)
+            print(f"{record.name}  {created:%Y-%m-%d %H:%M:%S}  {record.kind:<11}  {record.size:>12,} bytes")
+    finally:
+        manager.close()
+    return 0
+
+def restore_backup(name):
+    """Restore a backup without starting the interactive UI."""
+    try:
+        when = datetime.fromisoformat(name)
+    except ValueError:
+        when = None
+    
+    # The ledger is only loaded once restored, so a damaged one can be replaced
+    manager = ExpenseManager(load=False)
+    try:
+        record = manager.find_backup(when) if when else None
+        if record is not None:
+            name = record.name
+        if not manager.restore_backup(name):
+            print(f"❌ No backup named {name}; see --list-backups", file=sys.stderr)
+            return 1
+        print(f"Restored {name} ({len(manager.expenses)} expenses).")
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not restore {name}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        manager.close()
+    return 0
+
 def main():
     """Main application entry point."""
+    args = parse_args()
+    if args.import_file:
+        sys.exit(import_file(args.import_file))
+    if args.list_backups:
+        sys.exit(list_backups())
+    if args.restore:
+        sys.exit(restore_backup(args.restore))
+    
     print("🚀 Starting Personal Expense Tracker Pro...")
     
     # Check dependencies
@@ -0,0 +1,42 @@
+"""
+Money helpers for the expense tracker.
+Amounts are aggregated as integers in the currency's minor unit and only
+turned back into Decimal for presentation.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict
+
+DEFAULT_DECIMAL_PLACES = 2
+
+DEFAULT_CURRENCY_PRECISION = {
+    "Rs.": 2
+}
+
+
+def currency_decimal_places(config: Dict) -> int:
+    """Return the number of minor-unit decimal places for the configured currency."""
+    precision = config.get("currency_precision", DEFAULT_CURRENCY_PRECISION)
+    return int(precision.get(config.get("currency", "Rs."), DEFAULT_DECIMAL_PLACES))
+
+
+def quantize(amount: Decimal, decimal_places: int) -> Decimal:
+    """Round an amount to the minor unit, half up.
+
+    Raises ValueError for amounts with more digits than the decimal context
+    can hold at that precision.
+    """
+    try:
+        return amount.quantize(Decimal(1).scaleb(-decimal_places), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"amount {amount} has too many digits") from None
+
+
+def to_minor(amount: Decimal, decimal_places: int) -> int:
+    """Convert an amount to integer minor units, rounding half up."""
+    return int(amount.scaleb(decimal_places).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor(units: int, decimal_places: int) -> Decimal:
+    """Convert integer minor units back to a Decimal amount."""
+    return Decimal(units).scaleb(-decimal_places)
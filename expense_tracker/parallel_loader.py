@@ -0,0 +1,125 @@
+"""
+Parallel loading of large CSV ledgers into the column store.
+The file is split into byte ranges on row boundaries, each range is parsed
+into a column-store chunk by a worker process and the chunks are merged in
+file order.
+"""
+
+import csv
+import hashlib
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from columnar import ColumnarLedger
+from storage import FIELDNAMES, LedgerIntegrityError, find_footer, parse_footer
+
+# Files smaller than this load faster on one core than through a process pool
+PARALLEL_LOAD_MIN_BYTES = 16 << 20
+
+# Lower bound on the bytes handed to one worker task
+MIN_CHUNK_BYTES = 4 << 20
+
+
+def split_rows(data, start: int, end: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split data[start:end] into ranges of roughly chunk_size bytes on row boundaries.
+
+    start must be the beginning of a row. A newline only ends a row when it
+    is preceded by an even number of quote characters, so quoted fields
+    spanning several lines are never cut.
+    """
+    ranges = []
+    position = start
+    while end - position > chunk_size:
+        cut = position + chunk_size
+        quotes = data[position:cut].count(b'"')
+        while True:
+            newline = data.find(b'\n', cut, end)
+            if newline == -1:
+                cut = end
+                break
+            quotes += data[cut:newline + 1].count(b'"')
+            cut = newline + 1
+            if quotes % 2 == 0:
+                break
+        ranges.append((position, cut))
+        position = cut
+    if position < end:
+        ranges.append((position, end))
+    return ranges
+
+
+def parse_rows(path: Path, start: int, end: int, fieldnames: List[str],
+               decimal_places: int) -> ColumnarLedger:
+    """Parse one byte range of a ledger file into a column-store chunk.
+
+    Runs in a worker process. Raises ValueError for rows the column store
+    cannot hold, like ColumnarLedger.append.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+
+    date_at, category_at, amount_at = (fieldnames.index(name) for name in FIELDNAMES[:3])
+    description_at = fieldnames.index('description') if 'description' in fieldnames else len(fieldnames)
+    chunk = ColumnarLedger(None, decimal_places)
+    for row in csv.reader(io.StringIO(text, newline='')):
+        if not row:
+            continue
+        description = row[description_at] if description_at < len(row) else ''
+        chunk.append_fields(row[date_at], row[category_at], Decimal(row[amount_at]), description)
+    return chunk
+
+
+def load_columnar(path: Path, expense_type, decimal_places: int,
+                  workers: int) -> Tuple[ColumnarLedger, Optional[str]]:
+    """Load a ledger file into a column store using a pool of worker processes.
+
+    Verifies the checksum footer like read_ledger while the workers parse.
+    Returns the ledger and the footer checksum, or None for files written
+    without one.
+    """
+    ledger = ColumnarLedger(expense_type, decimal_places)
+    with open(path, 'rb') as file:
+        if file.seek(0, os.SEEK_END) == 0:
+            return ledger, None
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with data:
+        header_end = data.find(b'\n') + 1 or len(data)
+        fieldnames = next(csv.reader([data[:header_end].decode('utf-8')]), FIELDNAMES)
+        footer_start = find_footer(data)
+        if footer_start is None:
+            body_end, tail_start, checksum = len(data), len(data), None
+        else:
+            tail_start, expected_count, checksum = parse_footer(path, data, footer_start)
+            body_end = footer_start
+
+        chunk_size = max(MIN_CHUNK_BYTES, (body_end - header_end) // (workers * 4) + 1)
+        ranges = split_rows(data, header_end, body_end, chunk_size)
+        tail_ranges = split_rows(data, tail_start, len(data), chunk_size)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(parse_rows, path, start, end, fieldnames, decimal_places)
+                for start, end in ranges + tail_ranges
+            ]
+            # Hash the body here while the workers parse it
+            if checksum is not None and hashlib.sha256(memoryview(data)[:body_end]).hexdigest() != checksum:
+                for future in futures:
+                    future.cancel()
+                raise LedgerIntegrityError(f"{path} does not match its checksum; restore it from a backup")
+
+            body_rows = 0
+            for position, future in enumerate(futures):
+                ledger.extend_ledger(future.result())
+                if position == len(ranges) - 1:
+                    body_rows = len(ledger)
+
+    if checksum is not None and body_rows != expected_count:
+        raise LedgerIntegrityError(f"{path} holds {body_rows} rows but its footer records {expected_count}")
+    return ledger, checksum
@@ -0,0 +1,104 @@
+"""
+Search planning for the expense tracker.
+Picks the most selective indexed filter as the access path and applies the
+remaining filters as one fused predicate.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from indexes import ExpenseIndex, keyword_predicate
+
+
+@dataclass
+class SearchQuery:
+    """Filters accepted by ExpenseManager.search_expenses."""
+    keyword: str = ""
+    category: str = ""
+    start_date: str = ""
+    end_date: str = ""
+    min_amount: Optional[Decimal] = None
+    max_amount: Optional[Decimal] = None
+    keyword_mode: str = "substring"
+
+    @classmethod
+    def from_strings(cls, keyword: str = "", category: str = "", start_date: str = "", end_date: str = "",
+                     min_amount: str = "", max_amount: str = "", keyword_mode: str = "substring") -> "SearchQuery":
+        """Build a query from the string arguments used by the UI."""
+        return cls(
+            keyword=keyword,
+            category=category,
+            start_date=start_date,
+            end_date=end_date,
+            min_amount=Decimal(min_amount) if min_amount else None,
+            max_amount=Decimal(max_amount) if max_amount else None,
+            keyword_mode=keyword_mode
+        )
+
+    def predicate(self, skip: str = "") -> Optional[Callable[[object], bool]]:
+        """Return one test combining every filter except the skipped access path."""
+        checks = []
+        if self.keyword and skip != "keyword":
+            checks.append(keyword_predicate(self.keyword, self.keyword_mode))
+        if self.category and skip != "category":
+            category = self.category.lower()
+            checks.append(lambda e: e.category.lower() == category)
+        if (self.start_date or self.end_date) and skip != "date":
+            start_date, end_date = self.start_date, self.end_date
+            checks.append(lambda e: (not start_date or e.date >= start_date) and (not end_date or e.date <= end_date))
+        if self.min_amount is not None:
+            min_amount = self.min_amount
+            checks.append(lambda e: e.amount >= min_amount)
+        if self.max_amount is not None:
+            max_amount = self.max_amount
+            checks.append(lambda e: e.amount <= max_amount)
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda e: all(check(e) for check in checks)
+
+
+def plan(query: SearchQuery, index: Optional[ExpenseIndex]) -> Tuple[str, int]:
+    """Choose the access path with the fewest estimated rows.
+
+    Returns the path name ("keyword", "category", "date" or "scan") and its
+    row estimate. Amount filters have no index and never drive the plan.
+    """
+    if index is None:
+        return "scan", 0
+
+    best = ("scan", len(index))
+    if query.keyword:
+        estimate = index.estimate_keyword(query.keyword, query.keyword_mode)
+        if estimate is not None and estimate < best[1]:
+            best = ("keyword", estimate)
+    if query.category:
+        estimate = index.count_category(query.category)
+        if estimate < best[1]:
+            best = ("category", estimate)
+    if query.start_date or query.end_date:
+        estimate = index.count_date_range(query.start_date, query.end_date)
+        if estimate < best[1]:
+            best = ("date", estimate)
+    return best
+
+
+def run_search(query: SearchQuery, index: Optional[ExpenseIndex], expenses: Sequence) -> List:
+    """Execute a query, returning matching expenses in ledger order."""
+    path, _ = plan(query, index)
+    if path == "keyword":
+        candidates = index.keyword_matches(query.keyword, query.keyword_mode)
+    elif path == "category":
+        candidates = index.category_rows(query.category)
+    elif path == "date":
+        candidates = index.date_range(query.start_date, query.end_date)
+    else:
+        candidates = expenses
+
+    predicate = query.predicate(skip=path)
+    if predicate is None:
+        return list(candidates)
+    return [e for e in candidates if predicate(e)]
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+HTTP/JSON API for the expense tracker.
+Keeps one ExpenseManager loaded in memory and answers queries from it, so
+dashboards and scripts do not pay for a fresh load on every request.
+
+Usage:
+    python server.py
+    python server.py --host 0.0.0.0 --port 8765
+
+Endpoints:
+    GET  /expenses?keyword=&category=&start_date=&end_date=&min_amount=&max_amount=&limit=
+    POST /expenses              {"date", "category", "amount", "description"} or a list of them
+    GET  /reports/YYYY-MM       add ?expenses=false to leave out the month's expenses
+    GET  /budgets/YYYY-MM
+    PUT  /budgets/YYYY-MM       {"category", "limit"}
+    GET  /health
+
+Reads run on the event loop against the warm in-memory ledger. Every change
+goes through one writer task, which commits the additions queued while the
+previous commit was running as a single batch.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Add the current directory to Python path so modules can be imported
+sys.path.append(str(Path(__file__).parent))
+
+from expense_manager import ExpenseManager, Expense
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Requests larger than this are refused rather than buffered
+MAX_BODY_BYTES = 16 << 20
+
+# Upper bound on the additions committed together
+MAX_BATCH_EXPENSES = 10000
+
+SEARCH_FILTERS = ("keyword", "category", "start_date", "end_date", "min_amount", "max_amount")
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """An error answered with a status code and a JSON message."""
+
+    def __init__(self, status: int, message: str, details: Optional[List] = None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+    def payload(self) -> Dict:
+        """Return the JSON body describing the error."""
+        if self.details is None:
+            return {"error": str(self)}
+        return {"error": str(self), "details": self.details}
+
+
+@dataclass
+class Write:
+    """A change waiting for the writer: expenses to add, or a budget to set."""
+    future: asyncio.Future
+    expenses: Optional[List[Expense]] = None
+    budget: Optional[Tuple[str, str, Decimal]] = None  # (month, category, limit)
+
+
+def _json_default(value):
+    """Encode the Decimal amounts and Expense rows found in reports."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Expense):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ExpenseServer:
+    """Serves the JSON API over one ExpenseManager."""
+
+    def __init__(self, manager: ExpenseManager):
+        self.manager = manager
+        self.writes: "asyncio.Queue[Write]" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the writer task on the running event loop."""
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        """Stop the writer once it has committed everything queued."""
+        await self.writes.join()
+        if self._writer is not None:
+            self._writer.cancel()
+
+    async def _write_loop(self) -> None:
+        """Commit queued changes in arrival order, batching consecutive additions."""
+        while True:
+            pending = [await self.writes.get()]
+            # Let requests that arrived with this one join its batch
+            await asyncio.sleep(0)
+            while not self.writes.empty():
+                pending.append(self.writes.get_nowait())
+
+            batch: List[Write] = []
+            for write in pending:
+                if write.expenses is not None and sum(len(item.expenses) for item in batch) < MAX_BATCH_EXPENSES:
+                    batch.append(write)
+                    continue
+                self._commit_additions(batch)
+                batch = []
+                if write.expenses is not None:
+                    batch.append(write)
+                else:
+                    self._commit_budget(write)
+            self._commit_additions(batch)
+            for _ in pending:
+                self.writes.task_done()
+
+    def _commit_additions(self, batch: List[Write]) -> None:
+        """Add the expenses of several requests with one commit."""
+        if not batch:
+            return
+        expenses = [expense for write in batch for expense in write.expenses]
+        try:
+            added = self.manager.add_expenses(expenses)
+        except Exception as error:
+            for write in batch:
+                write.future.set_exception(error)
+            return
+        if added or len(batch) == 1:
+            for write in batch:
+                write.future.set_result(len(write.expenses) if added else 0)
+            return
+        # The ledger refused the batch as a whole; find out which requests it refuses
+        for write in batch:
+            self._commit_additions([write])
+
+    def _commit_budget(self, write: Write) -> None:
+        """Set one budget."""
+        try:
+            self.manager.set_budget(*write.budget)
+        except Exception as error:
+            write.future.set_exception(error)
+        else:
+            write.future.set_result(1)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one connection until the client closes it."""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                try:
+                    status, payload = await self.route(method, target, body)
+                except HTTPError as error:
+                    status, payload = error.status, error.payload()
+                except Exception as error:
+                    status, payload = 500, {"error": str(error)}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as error:
+            self._write_response(writer, error.status, error.payload(), keep_alive=False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Read one HTTP/1.1 request, or return None at the end of the connection."""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request bodies are limited to {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+        """Send a JSON response."""
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+    async def route(self, method: str, target: str, body: bytes) -> Tuple[int, object]:
+        """Dispatch a request to its endpoint, returning the status and JSON payload."""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "expenses": len(self.manager.expenses)}
+        if parts == ["expenses"]:
+            if method == "GET":
+                return 200, self.search(params)
+            if method == "POST":
+                return await self.add(self._json(body))
+            raise HTTPError(405, "use GET or POST")
+        if len(parts) == 2 and parts[0] == "reports":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return 200, self.report(self._month(parts[1]), params.get("expenses", "true").lower() != "false")
+        if len(parts) == 2 and parts[0] == "budgets":
+            month = self._month(parts[1])
+            if method == "GET":
+                self.manager.refresh()
+                return 200, self.manager.get_budget_status(month)
+            if method in ("PUT", "POST"):
+                return await self.set_budget(month, self._json(body))
+            raise HTTPError(405, "use GET or PUT")
+        raise HTTPError(404, f"no endpoint at {url.path}")
+
+    @staticmethod
+    def _json(body: bytes):
+        """Decode a JSON request body."""
+        try:
+            return json.loads(body or b'null')
+        except (json.JSONDecodeError, UnicodeDecodeError) as error:
+            raise HTTPError(400, f"invalid JSON: {error}")
+
+    def _month(self, month: str) -> str:
+        """Check a YYYY-MM month from the URL."""
+        if not self.manager.validate_date(f"{month}-01") or len(month) != 7:
+            raise HTTPError(400, f"invalid month {month!r}, expected YYYY-MM")
+        return month
+
+    def search(self, params: Dict[str, str]) -> Dict:
+        """Answer a search from the in-memory ledger."""
+        self.manager.refresh()
+        filters = {name: params.get(name, "") for name in SEARCH_FILTERS}
+        for name in ("min_amount", "max_amount"):
+            if filters[name]:
+                try:
+                    valid = Decimal(filters[name]).is_finite()
+                except InvalidOperation:
+                    valid = False
+                if not valid:
+                    raise HTTPError(400, f"{name} must be a number")
+        matches = self.manager.iter_expenses(**filters)
+        if "limit" in params:
+            try:
+                matches = islice(matches, max(0, int(params["limit"])))
+            except ValueError:
+                raise HTTPError(400, "limit must be a whole number")
+        expenses = [expense.to_dict() for expense in matches]
+        return {"count": len(expenses), "expenses": expenses}
+
+    def report(self, month: str, include_expenses: bool) -> Dict:
+        """Answer a monthly report from the in-memory ledger."""
+        self.manager.refresh()
+        report = self.manager.get_monthly_report(month)
+        if include_expenses:
+            report["expenses"] = list(report["expenses"])
+        else:
+            del report["expenses"]
+        return report
+
+    def _parse_expense(self, item) -> Expense:
+        """Validate one expense from a request body like add_expense does."""
+        if not isinstance(item, dict):
+            raise ValueError("each expense must be a JSON object")
+        date_str = str(item.get("date", "")).strip()
+        category = str(item.get("category", "")).lower().strip()
+        amount_str = str(item.get("amount", "")).strip()
+        if not self.manager.validate_date(date_str):
+            raise ValueError(f"invalid date {date_str!r}")
+        if not category:
+            raise ValueError("missing category")
+        if not self.manager.validate_amount(amount_str):
+            raise ValueError(f"invalid amount {amount_str!r}")
+        amount = self.manager.quantize_amount(Decimal(amount_str))
+        if amount <= 0:
+            raise ValueError(f"amount {amount_str} rounds to zero")
+        return Expense(date_str, category, amount, str(item.get("description") or "").strip())
+
+    async def add(self, payload) -> Tuple[int, Dict]:
+        """Queue validated expenses for the writer and wait for their commit."""
+        if self.manager.read_only:
+            raise HTTPError(405, "the server is read-only")
+        items = payload if isinstance(payload, list) else [payload]
+        expenses, errors = [], []
+        for position, item in enumerate(items):
+            try:
+                expenses.append(self._parse_expense(item))
+            except (ValueError, InvalidOperation) as error:
+                errors.append({"index": position, "error": str(error)})
+        if errors:
+            raise HTTPError(400, "invalid expenses, none were added", errors)
+        if not expenses:
+            raise HTTPError(400, "no expenses given")
+
+        write = Write(asyncio.get_running_loop().create_future(), expenses=expenses)
+        await self.writes.put(write)
+        added = await write.future
+        if not added:
+            raise HTTPError(409, "the ledger refused these expenses")
+        return 201, {"added": added}
+
+    async def set_budget(self, month: str, payload) -> Tuple[int, Dict]:
+        """Queue a budget change for the writer and wait for it."""
+        if self.manager.read_only:
+            raise HTTPError(405, "the server is read-only")
+        if not isinstance(payload, dict) or not str(payload.get("category", "")).strip():
+            raise HTTPError(400, "expected {\"category\": ..., \"limit\": ...}")
+        try:
+            limit = Decimal(str(payload.get("limit")))
+        except InvalidOperation:
+            raise HTTPError(400, "limit must be a number")
+        if not limit.is_finite() or limit < 0:
+            raise HTTPError(400, "limit must be a non-negative number")
+
+        category = str(payload["category"]).lower().strip()
+        write = Write(asyncio.get_running_loop().create_future(), budget=(month, category, limit))
+        await self.writes.put(write)
+        await write.future
+        return 200, {month: self.manager.get_budget_status(month).get(category)}
+
+
+async def serve(host: str, port: int, read_only: bool = False) -> None:
+    """Load the ledger and serve the API until cancelled."""
+    manager = ExpenseManager(read_only=read_only)
+    api = ExpenseServer(manager)
+    api.start()
+    try:
+        server = await asyncio.start_server(api.handle, host, port)
+        print(f"Serving {len(manager.expenses)} expenses on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.stop()
+        manager.close()
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for Personal Expense Tracker Pro")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default {DEFAULT_PORT})")
+    parser.add_argument("--read-only", action="store_true",
+                        help="serve queries only, from the memory-mapped snapshot")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Server entry point."""
+    args = parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.read_only))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    except OSError as error:
+        print(f"Could not start the server: {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
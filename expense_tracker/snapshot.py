@@ -0,0 +1,220 @@
+"""
+Binary snapshots of the column-store ledger.
+A snapshot holds the ledger's typed columns, category string table and
+description text as written bytes, so startup can skip parsing the CSV file
+when nothing has changed, and read-only processes can map the columns
+instead of loading them.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from columnar import ColumnarLedger, StringPool, TextColumn
+
+SNAPSHOT_MAGIC = b'EXPSNAP\x00'
+SNAPSHOT_VERSION = 2
+
+# magic, version, byte order, decimal places, source stamp (CSV size and
+# mtime, journal size and mtime), base rows, journal entries, base checksum,
+# row count, the string count and encoded size of the category table, and
+# the encoded size of the description text
+HEADER = struct.Struct('<8sHBBqqqqqq64sqqqq')
+
+# Sections start on 8-byte boundaries so every column can be viewed in place
+ALIGNMENT = 8
+
+# Array type codes of the date, category and amount columns, the description
+# byte end offsets and the category string offsets
+COLUMN_TYPES = 'iiqqq'
+
+# (CSV size, CSV mtime_ns, journal size, journal mtime_ns), -1 for a missing file
+Stamp = Tuple[int, int, int, int]
+
+
+@dataclass
+class SnapshotHeader:
+    """Ledger state recorded alongside the snapshot columns."""
+    decimal_places: int
+    stamp: Stamp
+    base_rows: Optional[int]
+    journal_entries: int
+    base_checksum: Optional[str]
+    rows: int
+    categories: int
+    category_bytes: int
+    description_bytes: int
+
+
+def source_stamp(ledger_path: Path, journal_path: Path) -> Stamp:
+    """Return the size and modification time of the ledger and journal files."""
+    stamp = []
+    for path in (ledger_path, journal_path):
+        try:
+            stat = os.stat(path)
+            stamp.extend((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stamp.extend((-1, -1))
+    return tuple(stamp)
+
+
+def _padding(offset: int) -> int:
+    """Return how many bytes take an offset to the next section boundary."""
+    return -offset % ALIGNMENT
+
+
+def _string_table(pool: StringPool) -> Tuple[array, bytes]:
+    """Encode a string pool as character end offsets plus one UTF-8 blob."""
+    text, ends = pool.table()
+    return ends, text.encode('utf-8', 'surrogatepass')
+
+
+def write_snapshot(path: Path, ledger: ColumnarLedger, stamp: Stamp, base_rows: Optional[int],
+                   journal_entries: int, base_checksum: Optional[str]) -> None:
+    """Write a ledger snapshot to a sibling temp file and rename it into place."""
+    category_offsets, category_blob = _string_table(ledger.category_pool)
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == 'little', ledger.decimal_places,
+        *stamp,
+        -1 if base_rows is None else base_rows, journal_entries,
+        (base_checksum or '').encode('ascii'),
+        len(ledger), len(ledger.category_pool), len(category_blob), len(ledger.descriptions.blob)
+    )
+    sections = (
+        header, ledger.dates, ledger.categories, ledger.amounts, ledger.descriptions.ends,
+        category_offsets, category_blob, bytes(ledger.descriptions.blob)
+    )
+
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'wb') as file:
+        for section in sections:
+            data = section if isinstance(section, bytes) else section.tobytes()
+            file.write(data + b'\x00' * _padding(len(data)))
+    os.replace(temp_path, path)
+
+
+def read_header(data) -> Optional[SnapshotHeader]:
+    """Parse a snapshot header, or return None if it is not a usable snapshot."""
+    if len(data) < HEADER.size:
+        return None
+    (magic, version, little_endian, decimal_places, *stamp_and_state) = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or little_endian != (sys.byteorder == 'little'):
+        return None
+    (csv_size, csv_mtime, journal_size, journal_mtime, base_rows, journal_entries, checksum,
+     rows, categories, category_bytes, description_bytes) = stamp_and_state
+    return SnapshotHeader(
+        decimal_places=decimal_places,
+        stamp=(csv_size, csv_mtime, journal_size, journal_mtime),
+        base_rows=None if base_rows < 0 else base_rows,
+        journal_entries=journal_entries,
+        base_checksum=checksum.rstrip(b'\x00').decode('ascii') or None,
+        rows=rows,
+        categories=categories,
+        category_bytes=category_bytes,
+        description_bytes=description_bytes
+    )
+
+
+def section_layout(header: SnapshotHeader) -> List[Tuple[int, int]]:
+    """Return the (offset, size) of each section after the header.
+
+    Sections are the date, category and amount columns, the description end
+    offsets, the category string offsets, and the category and description
+    UTF-8 blobs.
+    """
+    counts = (header.rows,) * 4 + (header.categories,)
+    sizes = [count * array(typecode).itemsize for typecode, count in zip(COLUMN_TYPES, counts)]
+    sizes += [header.category_bytes, header.description_bytes]
+    layout = []
+    offset = HEADER.size + _padding(HEADER.size)
+    for size in sizes:
+        layout.append((offset, size))
+        offset += size + _padding(size)
+    return layout
+
+
+def _decode_pool(ends: array, blob) -> StringPool:
+    """Rebuild a string pool from its end offsets and UTF-8 blob."""
+    return StringPool.from_table(bytes(blob).decode('utf-8', 'surrogatepass'), ends)
+
+
+def _check(data, stamp: Stamp, decimal_places: int) -> Optional[SnapshotHeader]:
+    """Return the header of a complete snapshot taken of the current files, or None."""
+    header = read_header(data)
+    if header is None or header.stamp != stamp or header.decimal_places != decimal_places:
+        return None
+    last_offset, last_size = section_layout(header)[-1]
+    if len(data) < last_offset + last_size:
+        return None
+    return header
+
+
+def _build_ledger(view: memoryview, header: SnapshotHeader, expense_type, copy: bool) -> ColumnarLedger:
+    """Assemble a column-store ledger from the sections of a snapshot buffer.
+
+    With copy the columns are read into private arrays; otherwise they are
+    memoryviews over the buffer itself.
+    """
+    layout = section_layout(header)
+    columns = []
+    for typecode, (offset, size) in zip(COLUMN_TYPES, layout):
+        if copy:
+            column = array(typecode)
+            column.frombytes(view[offset:offset + size])
+        else:
+            column = view[offset:offset + size].cast(typecode)
+        columns.append(column)
+    dates, categories, amounts, description_ends, category_offsets = columns
+    (category_offset, category_size), (description_offset, description_size) = layout[5:]
+    description_blob = view[description_offset:description_offset + description_size]
+
+    ledger = ColumnarLedger(expense_type, header.decimal_places)
+    ledger.dates, ledger.categories, ledger.amounts = dates, categories, amounts
+    ledger.descriptions = TextColumn(bytearray(description_blob) if copy else description_blob, description_ends)
+    ledger.category_pool = _decode_pool(category_offsets, view[category_offset:category_offset + category_size])
+    return ledger
+
+
+def read_snapshot(path: Path, expense_type, stamp: Stamp,
+                  decimal_places: int) -> Optional[Tuple[ColumnarLedger, SnapshotHeader]]:
+    """Load a snapshot taken of the current ledger and journal files.
+
+    Returns None when the snapshot is missing, unreadable, written for
+    another currency precision or stamped with different source files.
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    header = _check(data, stamp, decimal_places)
+    if header is None:
+        return None
+    return _build_ledger(memoryview(data), header, expense_type, copy=True), header
+
+
+def map_snapshot(path: Path, expense_type, stamp: Stamp,
+                 decimal_places: int) -> Optional[Tuple[ColumnarLedger, SnapshotHeader]]:
+    """Memory-map a current snapshot as a read-only ledger.
+
+    The numeric columns and description text stay in the mapping, so every
+    process mapping the same snapshot shares one copy in the page cache.
+    Only the category table is decoded into the process. The ledger rejects any modification.
+    Returns None under the same conditions as read_snapshot.
+    """
+    try:
+        with open(path, 'rb') as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # ValueError: an empty file cannot be mapped
+        return None
+    header = _check(mapping, stamp, decimal_places)
+    if header is None:
+        mapping.close()
+        return None
+    return _build_ledger(memoryview(mapping), header, expense_type, copy=False), header
@@ -0,0 +1,338 @@
+"""
+SQLite storage backend for the expense tracker.
+Keeps expenses in an indexed table so filters and aggregates run in SQL.
+"""
+
+import sqlite3
+from array import array
+from collections.abc import Sequence
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from indexes import keyword_predicate, tokenize
+
+# Amounts are also stored as integers in units of 1/10000 so SUM stays exact
+AMOUNT_SCALE = Decimal("0.0001")
+UNITS_PER_AMOUNT = 10000
+MAX_AMOUNT = Decimal((1 << 63) - 1) / UNITS_PER_AMOUNT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    amount_units INTEGER NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_amount ON expenses(amount_units);
+"""
+
+# Full-text indexes over descriptions and categories, kept in step by triggers:
+# whole words for "word" and "prefix" searches, trigrams for "substring" ones
+TEXT_INDEXES = {
+    "expense_words": "unicode61 remove_diacritics 0 tokenchars '_'",
+    "expense_trigrams": "trigram",
+}
+TEXT_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE {table} USING fts5(
+    description, category, content='expenses', content_rowid='id', tokenize="{tokenize}"
+);
+CREATE TRIGGER {table}_insert AFTER INSERT ON expenses BEGIN
+    INSERT INTO {table}(rowid, description, category) VALUES (new.id, new.description, new.category);
+END;
+CREATE TRIGGER {table}_delete AFTER DELETE ON expenses BEGIN
+    INSERT INTO {table}({table}, rowid, description, category) VALUES ('delete', old.id, old.description, old.category);
+END;
+CREATE TRIGGER {table}_update AFTER UPDATE ON expenses BEGIN
+    INSERT INTO {table}({table}, rowid, description, category) VALUES ('delete', old.id, old.description, old.category);
+    INSERT INTO {table}(rowid, description, category) VALUES (new.id, new.description, new.category);
+END;
+INSERT INTO {table}({table}) VALUES ('rebuild');
+"""
+# Trigrams only index keywords of at least this many characters
+TRIGRAM_MIN_LENGTH = 3
+
+COLUMNS = "date, category, amount, description"
+
+
+def to_units(amount: Decimal) -> int:
+    """Convert an amount to integer storage units.
+
+    Raises ValueError for amounts beyond the 64-bit range of a SQLite INTEGER.
+    """
+    if not -MAX_AMOUNT <= amount <= MAX_AMOUNT:
+        raise ValueError(f"amount {amount} is too large to store")
+    return int(amount.quantize(AMOUNT_SCALE, rounding=ROUND_HALF_UP) * UNITS_PER_AMOUNT)
+
+
+def from_units(units: int) -> Decimal:
+    """Convert integer storage units back to an amount."""
+    return Decimal(units or 0) / UNITS_PER_AMOUNT
+
+
+def bound_units(amount: Decimal) -> int:
+    """Convert a search bound to storage units, clamped to the storable range."""
+    return to_units(max(-MAX_AMOUNT, min(MAX_AMOUNT, amount)))
+
+
+def month_range(month: str) -> Tuple[str, str]:
+    """Return bounds selecting every date string that starts with month."""
+    return month, month + "\U0010ffff"
+
+
+class SqliteStore:
+    """Expense storage backed by a SQLite database."""
+
+    def __init__(self, path: Path, expense_type):
+        self.path = path
+        self.expense_type = expense_type
+        self.conn = sqlite3.connect(str(path))
+        self.conn.create_function("py_lower", 1, lambda value: value.lower() if value else "")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.text_indexes = {table for table, tokenize in TEXT_INDEXES.items() if self._create_text_index(table, tokenize)}
+        # Row ids in ledger order, re-read when another connection commits
+        self._ids: Optional[array] = None
+        self._ids_version = None
+
+    def _create_text_index(self, table: str, tokenize: str) -> bool:
+        """Create a full-text index over the existing rows, returning whether it is available."""
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        if exists:
+            return True
+        try:
+            # executescript commits first, so the index is built in its own transaction
+            self.conn.executescript(f"BEGIN;{TEXT_INDEX_SCHEMA.format(table=table, tokenize=tokenize)}COMMIT;")
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5, or too old for the trigram tokenizer
+            self.conn.rollback()
+            return False
+        return True
+
+    @property
+    def needs_migration(self) -> bool:
+        """Whether the CSV ledger has not been imported yet."""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    def migrate(self, expenses: Iterable) -> None:
+        """Import existing expenses and mark the database as migrated, atomically."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO expenses (date, category, amount, amount_units, description) VALUES (?, ?, ?, ?, ?)",
+                (self._params(expense) for expense in expenses)
+            )
+            self.conn.execute("PRAGMA user_version = 1")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.conn.close()
+
+    def _row_to_expense(self, row: Tuple):
+        """Build an expense from a (date, category, amount, description) row."""
+        return self.expense_type(row[0], row[1], Decimal(row[2]), row[3])
+
+    @staticmethod
+    def _params(expense) -> Tuple:
+        """Column values for inserting or updating an expense."""
+        return (expense.date, expense.category, str(expense.amount), to_units(expense.amount), expense.description)
+
+    def _row_ids(self) -> array:
+        """Return the row ids in ledger order."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._ids is None or version != self._ids_version:
+            self._ids = array('q', (row[0] for row in self.conn.execute("SELECT id FROM expenses ORDER BY id")))
+            self._ids_version = version
+        return self._ids
+
+    def _row_id(self, index: int) -> Optional[int]:
+        """Return the row id at a ledger position."""
+        ids = self._row_ids()
+        return ids[index] if 0 <= index < len(ids) else None
+
+    def count(self) -> int:
+        """Return the number of stored expenses."""
+        return self.conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+    def get(self, index: int):
+        """Return the expense at a ledger position, or None."""
+        row_id = self._row_id(index)
+        if row_id is None:
+            return None
+        row = self.conn.execute(f"SELECT {COLUMNS} FROM expenses WHERE id = ?", (row_id,)).fetchone()
+        return self._row_to_expense(row) if row else None
+
+    def iterate(self) -> Iterator:
+        """Stream all expenses in ledger order."""
+        cursor = self.conn.execute(f"SELECT {COLUMNS} FROM expenses ORDER BY id")
+        for row in cursor:
+            yield self._row_to_expense(row)
+
+    def add_many(self, expenses: Iterable) -> None:
+        """Insert expenses in a single transaction."""
+        ids = self._row_ids()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO expenses (date, category, amount, amount_units, description) VALUES (?, ?, ?, ?, ?)",
+                (self._params(expense) for expense in expenses)
+            )
+        # New rows get ids above every existing one
+        last = ids[-1] if ids else 0
+        ids.extend(row[0] for row in self.conn.execute("SELECT id FROM expenses WHERE id > ? ORDER BY id", (last,)))
+
+    def replace(self, index: int, expense) -> bool:
+        """Replace the expense at a ledger position."""
+        row_id = self._row_id(index)
+        if row_id is None:
+            return False
+        with self.conn:
+            self.conn.execute(
+                "UPDATE expenses SET date = ?, category = ?, amount = ?, amount_units = ?, description = ? WHERE id = ?",
+                self._params(expense) + (row_id,)
+            )
+        return True
+
+    def delete(self, index: int) -> bool:
+        """Delete the expense at a ledger position."""
+        row_id = self._row_id(index)
+        if row_id is None:
+            return False
+        with self.conn:
+            self.conn.execute("DELETE FROM expenses WHERE id = ?", (row_id,))
+        del self._ids[index]
+        return True
+
+    def search(self, keyword: str = "", category: str = "", start_date: str = "", end_date: str = "",
+               min_amount: str = "", max_amount: str = "", keyword_mode: str = "substring") -> List:
+        """Return expenses matching all given filters, in ledger order."""
+        return list(self.iter_search(keyword, category, start_date, end_date, min_amount, max_amount, keyword_mode))
+
+    def _keyword_clause(self, keyword: str, mode: str) -> Optional[Tuple[str, List]]:
+        """Return an SQL clause selecting candidate rows for a keyword, or None to check every row.
+
+        The clause may select extra rows; iter_search checks each candidate
+        with the same test as the in-memory indexes.
+        """
+        if mode == "substring":
+            if "expense_trigrams" in self.text_indexes and len(keyword) >= TRIGRAM_MIN_LENGTH:
+                phrase = '"' + keyword.replace('"', '""') + '"'
+                return "id IN (SELECT rowid FROM expense_trigrams WHERE expense_trigrams MATCH ?)", [phrase]
+            # Too short for trigrams, so this scans the table
+            needle = keyword.lower()
+            return "(instr(py_lower(description), ?) > 0 OR instr(py_lower(category), ?) > 0)", [needle, needle]
+        if "expense_words" not in self.text_indexes:
+            return None
+        suffix = "*" if mode == "prefix" else ""
+        terms = " AND ".join(f'"{word}"{suffix}' for word in tokenize(keyword))
+        return "id IN (SELECT rowid FROM expense_words WHERE expense_words MATCH ?)", [terms]
+
+    def iter_search(self, keyword: str = "", category: str = "", start_date: str = "", end_date: str = "",
+                    min_amount: str = "", max_amount: str = "", keyword_mode: str = "substring") -> Iterator:
+        """Stream expenses matching all given filters, in ledger order."""
+        clauses, params = [], []
+
+        matches_keyword = None
+        if keyword:
+            if keyword_mode != "substring" and not tokenize(keyword):
+                # A keyword without words matches nothing, as with the CSV backend
+                return
+            matches_keyword = keyword_predicate(keyword, keyword_mode)
+            keyword_clause = self._keyword_clause(keyword, keyword_mode)
+            if keyword_clause is not None:
+                clauses.append(keyword_clause[0])
+                params += keyword_clause[1]
+        if category:
+            clauses.append("category = ? COLLATE NOCASE")
+            params.append(category)
+        if start_date:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        if min_amount:
+            clauses.append("amount_units >= ?")
+            params.append(bound_units(Decimal(min_amount)))
+        if max_amount:
+            clauses.append("amount_units <= ?")
+            params.append(bound_units(Decimal(max_amount)))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(f"SELECT {COLUMNS} FROM expenses {where} ORDER BY id", params)
+        for row in cursor:
+            expense = self._row_to_expense(row)
+            if matches_keyword is None or matches_keyword(expense):
+                yield expense
+
+    def month_expenses(self, month: str) -> List:
+        """Return all expenses of a month in ledger order."""
+        cursor = self.conn.execute(
+            f"SELECT {COLUMNS} FROM expenses WHERE date >= ? AND date < ? ORDER BY id", month_range(month)
+        )
+        return [self._row_to_expense(row) for row in cursor]
+
+    def category_totals(self, month: str) -> Dict[str, Decimal]:
+        """Return spending per category for a month."""
+        cursor = self.conn.execute(
+            "SELECT category, SUM(amount_units) FROM expenses WHERE date >= ? AND date < ? GROUP BY category",
+            month_range(month)
+        )
+        return {category: from_units(units) for category, units in cursor}
+
+    def category_total(self, month: str, category: str) -> Decimal:
+        """Return spending for one category in a month."""
+        low, high = month_range(month)
+        units = self.conn.execute(
+            "SELECT SUM(amount_units) FROM expenses WHERE category = ? COLLATE NOCASE AND date >= ? AND date < ?",
+            (category, low, high)
+        ).fetchone()[0]
+        return from_units(units)
+
+    def categories(self) -> List[str]:
+        """Return the distinct categories in use."""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT category FROM expenses")]
+
+    def backup_to(self, path: Path) -> None:
+        """Write a consistent copy of the database to path.
+
+        The copy is read through a connection of its own, so it can run on a
+        backup thread while this one keeps serving the ledger. Raises OSError
+        if it fails, like a file copy.
+        """
+        source = sqlite3.connect(str(self.path))
+        try:
+            target = sqlite3.connect(str(path))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        except sqlite3.Error as error:
+            raise OSError(f"could not back up {self.path}: {error}") from error
+        finally:
+            source.close()
+
+
+class SqliteExpenseList(Sequence):
+    """Read-only list view over the expenses table, in ledger order."""
+
+    def __init__(self, store: SqliteStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return self.store.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        expense = self.store.get(index) if index >= 0 else None
+        if expense is None:
+            raise IndexError("expense index out of range")
+        return expense
+
+    def __iter__(self) -> Iterator:
+        return self.store.iterate()
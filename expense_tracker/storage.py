@@ -0,0 +1,363 @@
+"""
+Storage helpers for the expense ledger.
+Low-level CSV and journal routines shared by the expense manager.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+from collections.abc import Sequence
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+FIELDNAMES = ['date', 'category', 'amount', 'description']
+
+# Trailing line written by atomic saves: "#footer,<row count>,<sha256 of preceding bytes>"
+FOOTER_MARKER = b'#footer,'
+WRITE_BATCH_SIZE = 10000
+QUOTE_SCAN_BYTES = 1 << 20
+
+
+class LedgerIntegrityError(ValueError):
+    """Raised when a ledger file does not match its checksum footer."""
+
+
+def write_atomic(path: Path, rows: Iterable[Dict]) -> Tuple[str, int]:
+    """Write rows to a sibling temp file and rename it over the ledger.
+
+    The file ends with a footer holding the row count and a SHA-256 of
+    everything before it. Returns the checksum and the row count.
+    """
+    temp_path = path.with_name(path.name + '.tmp')
+    digest = hashlib.sha256()
+    count = 0
+
+    with open(temp_path, 'wb') as file:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            if count % WRITE_BATCH_SIZE == 0:
+                _flush_buffer(buffer, file, digest)
+        _flush_buffer(buffer, file, digest)
+
+        checksum = digest.hexdigest()
+        file.write(FOOTER_MARKER + f"{count},{checksum}\r\n".encode('ascii'))
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_path, path)
+    _fsync_directory(path.parent)
+    return checksum, count
+
+
+def _flush_buffer(buffer: io.StringIO, file, digest) -> None:
+    """Move buffered CSV text into the file, updating the running checksum."""
+    data = buffer.getvalue().encode('utf-8')
+    digest.update(data)
+    file.write(data)
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def remove_file(path: Path) -> None:
+    """Delete a file if it exists."""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _fsync_directory(directory: Path) -> None:
+    """Persist a rename by syncing its directory where the platform allows it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_ledger(path: Path) -> Tuple[List[Dict], Optional[str]]:
+    """Read all rows from a ledger file, verifying its footer if present.
+
+    Rows appended after the footer are returned as well. Returns the rows
+    and the footer checksum, or None for files written without one.
+    """
+    data = path.read_bytes()
+    body, tail, checksum = data, b'', None
+
+    footer_start = find_footer(data)
+    if footer_start is not None:
+        footer_end, expected_count, checksum = parse_footer(path, data, footer_start)
+        body, tail = data[:footer_start], data[footer_end:]
+        if hashlib.sha256(body).hexdigest() != checksum:
+            raise LedgerIntegrityError(f"{path} does not match its checksum; restore it from a backup")
+
+    reader = csv.DictReader(io.StringIO(body.decode('utf-8'), newline=''))
+    rows = list(reader)
+    if footer_start is not None and len(rows) != expected_count:
+        raise LedgerIntegrityError(f"{path} holds {len(rows)} rows but its footer records {expected_count}")
+
+    if tail:
+        fieldnames = reader.fieldnames or FIELDNAMES
+        rows.extend(csv.DictReader(io.StringIO(tail.decode('utf-8'), newline=''), fieldnames=fieldnames))
+    return rows, checksum
+
+
+def find_footer(data) -> Optional[int]:
+    """Return the offset of the footer line in file bytes or a mapping, if there is one.
+
+    A quoted description can hold a line that looks like a footer, so only
+    a candidate preceded by an even number of quote characters counts.
+    """
+    end, quotes = len(data), None
+    while True:
+        position = data.rfind(b'\n' + FOOTER_MARKER, 0, end)
+        start = position + 1
+        if position == -1:
+            if data[:len(FOOTER_MARKER)] != FOOTER_MARKER:
+                return None
+        # Count the quotes before the last candidate once, then only those skipped since
+        quotes = count_quotes(data, 0, start) if quotes is None else quotes - count_quotes(data, start, end)
+        if quotes % 2 == 0:
+            return start
+        if position == -1:
+            return None
+        end = start
+
+
+def count_quotes(data, start: int, end: int) -> int:
+    """Count the double quotes in a range of file bytes or a mapping."""
+    # Mappings have no count method, so they are scanned in slices
+    return sum(data[offset:min(offset + QUOTE_SCAN_BYTES, end)].count(b'"')
+               for offset in range(start, end, QUOTE_SCAN_BYTES))
+
+
+def parse_footer(path: Path, data, footer_start: int) -> Tuple[int, int, str]:
+    """Return the end offset, row count and checksum of a footer line."""
+    footer_end = data.find(b'\n', footer_start)
+    footer_end = len(data) if footer_end == -1 else footer_end + 1
+    try:
+        fields = data[footer_start + len(FOOTER_MARKER):footer_end].decode('ascii').strip().split(',')
+        return footer_end, int(fields[0]), fields[1]
+    except (UnicodeDecodeError, ValueError, IndexError):
+        raise LedgerIntegrityError(f"{path} has a malformed checksum footer")
+
+
+def iter_ledger(path: Path) -> Iterator[Dict]:
+    """Stream rows from a ledger file one at a time, skipping the footer.
+
+    Unlike read_ledger this does not verify the checksum, so memory use
+    stays constant regardless of the file size.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            if row['date'].startswith('#footer'):
+                continue
+            yield row
+
+
+def parse_appended_rows(path: Path, data: bytes) -> List[Dict]:
+    """Parse rows appended to a ledger file after the part already read.
+
+    Raises ValueError if they hold a footer, which only a full rewrite
+    writes, so the bytes are not a plain append.
+    """
+    if find_footer(data) is not None:
+        raise ValueError(f"{path} was rewritten")
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        fieldnames = next(csv.reader([file.readline()]), None) or FIELDNAMES
+    return list(csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=fieldnames))
+
+
+def count_rows(path: Path) -> int:
+    """Count the rows of a ledger file without keeping them."""
+    try:
+        return sum(1 for _ in iter_ledger(path))
+    except FileNotFoundError:
+        return 0
+
+
+def read_footer_checksum(path: Path) -> Optional[str]:
+    """Return the checksum recorded in a ledger footer without parsing the rows."""
+    try:
+        with open(path, 'rb') as file:
+            if file.seek(0, os.SEEK_END) == 0:
+                return None
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    # Telling a footer from a description line takes the quotes before it, so map the whole file
+    with data:
+        footer_start = find_footer(data)
+        if footer_start is None:
+            return None
+        line_end = data.find(b'\n', footer_start)
+        line = data[footer_start:line_end if line_end != -1 else len(data)]
+    fields = line.decode('ascii', 'replace').strip().split(',')
+    return fields[2] if len(fields) > 2 else None
+
+
+def append_rows(path: Path, rows: Iterable[Dict], fsync: bool = False) -> None:
+    """Append rows to an existing CSV file without rewriting it.
+
+    The rows are serialized up front and written with a single call so a
+    partially written record is as unlikely as the OS allows.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES)
+    writer.writerows(rows)
+    data = buffer.getvalue().encode('utf-8')
+    if not data:
+        return
+
+    with open(path, 'ab+') as file:
+        # Guard against files edited by hand that lack a trailing newline
+        if file.tell() > 0:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) not in (b'\n', b'\r'):
+                data = b'\r\n' + data
+        file.write(data)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def append_journal(path: Path, records: Iterable[Dict], fsync: bool = False) -> None:
+    """Append operation records to the journal as JSON lines."""
+    data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    if not data:
+        return
+
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(data)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def read_journal(path: Path) -> List[Dict]:
+    """Read all operation records from the journal.
+
+    A torn final line left behind by a crash mid-append is ignored.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return parse_journal(file)
+    except FileNotFoundError:
+        return []
+
+
+def parse_journal(lines: Iterable[str]) -> List[Dict]:
+    """Parse journal lines, stopping at the first one that is not a whole record."""
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+    return records
+
+
+class JournalOverlay:
+    """Journal operations applied on top of a ledger that is only ever streamed.
+
+    The logical ledger is kept as a list of segments: (start, stop) ranges of
+    base file rows, in file order, and row dicts added or edited through the
+    journal. Index-based operations split segments instead of touching rows.
+    """
+
+    def __init__(self, base_rows: int):
+        self.segments: List[Union[Tuple[int, int], Dict]] = [(0, base_rows)] if base_rows else []
+        self.base_rows = base_rows
+
+    def __len__(self) -> int:
+        return sum(segment[1] - segment[0] if isinstance(segment, tuple) else 1 for segment in self.segments)
+
+    def grow(self, count: int) -> None:
+        """Account for rows appended to the end of the base file."""
+        self.segments.append((self.base_rows, self.base_rows + count))
+        self.base_rows += count
+
+    def apply(self, record: Dict) -> bool:
+        """Apply one journal record. Returns False if its index is out of range."""
+        op = record.get('op')
+        if op == 'add':
+            self.segments.append(record['row'])
+            return True
+
+        index = record.get('index', -1)
+        offset = 0
+        for position, segment in enumerate(self.segments):
+            length = segment[1] - segment[0] if isinstance(segment, tuple) else 1
+            if index < 0 or index >= offset + length:
+                offset += length
+                continue
+
+            replacement = [record['row']] if op == 'edit' else []
+            if isinstance(segment, tuple):
+                split = segment[0] + index - offset
+                pieces = [(segment[0], split)] + replacement + [(split + 1, segment[1])]
+                replacement = [piece for piece in pieces if not isinstance(piece, tuple) or piece[1] > piece[0]]
+            self.segments[position:position + 1] = replacement
+            return True
+        return False
+
+    def iterate(self, base_rows: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the logical ledger rows given a stream of the base file rows."""
+        base = iter(base_rows)
+        position = 0
+        for segment in self.segments:
+            if not isinstance(segment, tuple):
+                yield segment
+                continue
+            start, stop = segment
+            if start > position:
+                next(islice(base, start - position - 1, None), None)
+            yield from islice(base, stop - start)
+            position = stop
+
+
+class LazyLedger(Sequence):
+    """List view of the ledger that streams rows from disk instead of holding them."""
+
+    def __init__(self, path: Path, expense_type, overlay: JournalOverlay):
+        self.path = path
+        self.expense_type = expense_type
+        self.overlay = overlay
+
+    def __len__(self) -> int:
+        return len(self.overlay)
+
+    def __iter__(self) -> Iterator:
+        for row in self.overlay.iterate(iter_ledger(self.path)):
+            yield self.expense_type.from_dict(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return list(islice(iter(self), start, stop, step)) if step > 0 else list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("expense index out of range")
+        # The file can hold fewer rows than the overlay expects if it changed since
+        expense = next(islice(iter(self), index, None), None)
+        if expense is None:
+            raise IndexError("expense index out of range")
+        return expense
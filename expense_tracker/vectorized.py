@@ -0,0 +1,170 @@
+"""
+NumPy kernels over the column-store ledger.
+Search filters become boolean masks and monthly breakdowns grouped sums.
+NumPy is optional; callers check NUMPY_AVAILABLE and otherwise keep to the
+pure-Python paths.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from typing import Dict, List
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from columnar import ColumnarLedger, month_ordinals
+from indexes import keyword_terms
+from query import SearchQuery
+
+# Bincount sums in float64, which is exact while totals stay below 2**53
+EXACT_FLOAT_LIMIT = 2 ** 53
+
+# Every representable date, for mapping string bounds onto ordinals
+DATE_ORDINALS = range(date.min.toordinal(), date.max.toordinal() + 1)
+
+
+def _columns(ledger: ColumnarLedger):
+    """Return zero-copy views of the date, category and amount columns.
+
+    Columns may be arrays or memoryviews over a mapped snapshot. The views
+    pin the underlying arrays, so they must not outlive the call that created
+    them; a pinned array cannot grow or shrink.
+    """
+    return tuple(
+        np.asarray(column)
+        for column in (ledger.dates, ledger.categories, ledger.amounts)
+    )
+
+
+def _pool_mask(pool, test) -> "np.ndarray":
+    """Evaluate a string test once per pooled string."""
+    return np.fromiter((test(value) for value in pool.strings), dtype=bool, count=len(pool))
+
+
+def _text_mask(column, test) -> "np.ndarray":
+    """Evaluate a string test once per row of a text column."""
+    return np.fromiter(map(test, column), dtype=bool, count=len(column))
+
+
+class _IsoDates:
+    """The ISO strings of every representable date, in order, built on access.
+
+    Lets bisect search the strings directly; its key argument needs Python 3.10.
+    """
+
+    def __len__(self) -> int:
+        return len(DATE_ORDINALS)
+
+    def __getitem__(self, index: int) -> str:
+        return date.fromordinal(DATE_ORDINALS[index]).isoformat()
+
+
+ISO_DATES = _IsoDates()
+
+
+def _date_mask(dates, start_date: str, end_date: str) -> "np.ndarray":
+    """Mask rows within string date bounds, compared as the unindexed filter does."""
+    # ISO strings sort like their ordinals, so each bound maps to an ordinal cut-off
+    mask = np.ones(len(dates), dtype=bool)
+    if start_date:
+        mask &= dates >= DATE_ORDINALS[0] + bisect_left(ISO_DATES, start_date)
+    if end_date:
+        mask &= dates < DATE_ORDINALS[0] + bisect_right(ISO_DATES, end_date)
+    return mask
+
+
+def _minor_bound(amount: Decimal, decimal_places: int, rounding: str) -> int:
+    """Round an amount bound to whole minor units in the given direction."""
+    return int(amount.scaleb(decimal_places).to_integral_value(rounding=rounding))
+
+
+def search_positions(ledger: ColumnarLedger, query: SearchQuery) -> List[int]:
+    """Return the row positions matching a query, in ledger order."""
+    if not len(ledger):
+        return []
+    dates, categories, amounts = _columns(ledger)
+    mask = np.ones(len(ledger), dtype=bool)
+
+    if query.keyword:
+        terms = keyword_terms(query.keyword, query.keyword_mode)
+        if not terms:
+            return []
+        for term in terms:
+            mask &= (_text_mask(ledger.descriptions, term) |
+                     _pool_mask(ledger.category_pool, term)[categories])
+    if query.category:
+        category = query.category.lower()
+        mask &= _pool_mask(ledger.category_pool, lambda value: value.lower() == category)[categories]
+    if query.start_date or query.end_date:
+        mask &= _date_mask(dates, query.start_date, query.end_date)
+    # Stored amounts are whole minor units, so amount bounds round inwards exactly
+    if query.min_amount is not None:
+        mask &= amounts >= _minor_bound(query.min_amount, ledger.decimal_places, ROUND_CEILING)
+    if query.max_amount is not None:
+        mask &= amounts <= _minor_bound(query.max_amount, ledger.decimal_places, ROUND_FLOOR)
+    return np.flatnonzero(mask).tolist()
+
+
+def _month_mask(dates, month: str):
+    """Mask rows dated within a YYYY-MM month, or None for a malformed month."""
+    try:
+        first, last = month_ordinals(month)
+    except ValueError:
+        return None
+    return (dates >= first) & (dates < last)
+
+
+def month_positions(ledger: ColumnarLedger, month: str) -> List[int]:
+    """Return the row positions dated within a YYYY-MM month."""
+    if not len(ledger):
+        return []
+    dates = _columns(ledger)[0]
+    mask = _month_mask(dates, month)
+    return [] if mask is None else np.flatnonzero(mask).tolist()
+
+
+def _grouped_sum(codes, values, size: int) -> "np.ndarray":
+    """Sum integer values per code, exactly."""
+    if int(np.abs(values).sum()) < EXACT_FLOAT_LIMIT:
+        return np.rint(np.bincount(codes, weights=values, minlength=size)).astype(np.int64)
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, codes, values)
+    return sums
+
+
+def month_totals(ledger: ColumnarLedger, month: str) -> Dict[str, int]:
+    """Return spending per category for a YYYY-MM month, in minor units."""
+    if not len(ledger):
+        return {}
+    dates, categories, amounts = _columns(ledger)
+    mask = _month_mask(dates, month)
+    if mask is None:
+        return {}
+    codes, values = categories[mask], amounts[mask]
+    sums = _grouped_sum(codes, values, len(ledger.category_pool))
+    present = np.flatnonzero(np.bincount(codes, minlength=len(ledger.category_pool)))
+    return {ledger.category_pool[code]: int(sums[code]) for code in present.tolist()}
+
+
+def category_units(ledger: ColumnarLedger, month: str, category: str) -> int:
+    """Return spending for one category in a YYYY-MM month, in minor units."""
+    code = ledger.category_pool.lookup(category)
+    if code < 0:
+        return 0
+    dates, categories, amounts = _columns(ledger)
+    mask = _month_mask(dates, month)
+    if mask is None:
+        return 0
+    return int(amounts[mask & (categories == code)].sum())
+
+
+def total_units(ledger: ColumnarLedger) -> int:
+    """Return the sum of every amount in the ledger, in minor units."""
+    if not len(ledger):
+        return 0
+    return int(_columns(ledger)[2].sum())
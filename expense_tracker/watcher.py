@@ -0,0 +1,114 @@
+"""
+Change detection for the ledger files.
+A FileWatcher tells a running session that another process touched the
+ledger, through inotify where the inotify_simple package is installed and
+by polling file size and modification time otherwise. FileState records how
+far a session has read a file, so rows appended since can be read alone.
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from inotify_simple import INotify, flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INotify = None
+    flags = None
+    INOTIFY_AVAILABLE = False
+
+# Bytes kept from the end of the read part of a file, to tell an append from
+# a rewrite that happened to reuse the file's inode
+TAIL_BYTES = 64
+
+
+@dataclass(frozen=True)
+class FileState:
+    """How much of a file a session has read."""
+    inode: int
+    size: int
+    tail: bytes
+
+
+def file_state(path: Path) -> Optional[FileState]:
+    """Return the state of a file read to its end, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            file.seek(max(0, size - TAIL_BYTES))
+            return FileState(os.fstat(file.fileno()).st_ino, size, file.read(size - file.tell()))
+    except FileNotFoundError:
+        return None
+
+
+def read_appended(path: Path, state: Optional[FileState]) -> Optional[Tuple[bytes, FileState]]:
+    """Return the complete lines appended to a file since state, and the new state.
+
+    Returns None if the file was replaced, truncated or rewritten instead of
+    appended to. A missing state reads the file from its start.
+    """
+    with open(path, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        start = 0
+        if state is not None:
+            if stat.st_ino != state.inode or stat.st_size < state.size:
+                return None
+            file.seek(state.size - len(state.tail))
+            if file.read(len(state.tail)) != state.tail:
+                return None
+            start = state.size
+        file.seek(start)
+        data = file.read(stat.st_size - start)
+
+    # A line still being written is left for the next read
+    data = data[:data.rfind(b'\n') + 1]
+    end = start + len(data)
+    tail = ((state.tail if state else b'') + data)[-TAIL_BYTES:]
+    return data, FileState(stat.st_ino, end, tail)
+
+
+class FileWatcher:
+    """Reports whether any of a set of files in one directory changed since the last check."""
+
+    def __init__(self, paths: List[Path]):
+        self.paths = paths
+        self._names = {path.name for path in paths}
+        self._inotify = None
+        self._stats: Dict[Path, Optional[Tuple[int, int, int]]] = {}
+        if INOTIFY_AVAILABLE:
+            try:
+                self._inotify = INotify()
+                # Watch the directory so atomic renames and re-created files are seen too
+                self._inotify.add_watch(str(paths[0].parent), flags.MODIFY | flags.CREATE | flags.DELETE |
+                                        flags.MOVED_TO | flags.MOVED_FROM)
+                return
+            except OSError:
+                # e.g. the per-user watch limit is reached
+                self._inotify = None
+        self._stats = {path: self._stat(path) for path in paths}
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[int, int, int]]:
+        """Return the inode, size and modification time of a file, or None if it is missing."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def changed(self) -> bool:
+        """Whether any watched file changed since the last call."""
+        if self._inotify is not None:
+            return any(event.name in self._names for event in self._inotify.read(timeout=0))
+        stats = {path: self._stat(path) for path in self.paths}
+        changed = stats != self._stats
+        self._stats = stats
+        return changed
+
+    def close(self) -> None:
+        """Release the inotify instance, if any."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
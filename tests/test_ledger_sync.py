@@ -0,0 +1,71 @@
+"""Tests for keeping a ledger in step with changes made outside the session."""
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'expense_tracker'))
+
+from expense_manager import ExpenseManager  # noqa: E402
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """Open a manager on an empty data directory with the given settings."""
+    monkeypatch.chdir(tmp_path)
+
+    def open_ledger(**settings):
+        manager = ExpenseManager()
+        manager.config.update(auto_backup=False, **settings)
+        manager.save_config()
+        manager.close()
+        return ExpenseManager()
+
+    return open_ledger
+
+
+@pytest.mark.parametrize('settings', [
+    {'write_mode': 'append'},
+    {'write_mode': 'rewrite'},
+    {'write_mode': 'journal'},
+    {'write_mode': 'rewrite', 'memory_layout': 'columnar'},
+    {'write_mode': 'rewrite', 'preload': False},
+])
+def test_external_append_survives_edit(ledger, settings):
+    manager = ledger(**settings)
+    manager.add_expense('2024-01-01', 'food', Decimal('1.00'), 'first')
+    manager.add_expense('2024-01-02', 'food', Decimal('2.00'), 'second')
+
+    with open('data/expenses.csv', 'a', encoding='utf-8', newline='') as f:
+        f.write('2024-01-03,other,3.00,external\r\n')
+
+    assert manager.edit_expense(0, '2024-01-01', 'food', Decimal('9.00'), 'edited')
+    manager.close()
+
+    reopened = ExpenseManager()
+    assert sorted(e.description for e in reopened.expenses) == ['edited', 'external', 'second']
+    reopened.close()
+
+
+@pytest.mark.parametrize('settings', [{}, {'memory_layout': 'columnar'}, {'preload': False}])
+def test_journal_replays_against_its_own_base(ledger, settings):
+    manager = ledger(write_mode='journal', **settings)
+    for description in ('a', 'b', 'c'):
+        manager.add_expense('2024-01-01', 'food', Decimal('1.00'), description)
+    manager.compact()
+    manager.add_expense('2024-01-02', 'food', Decimal('2.00'), 'journaled')
+    manager.close()
+
+    with open('data/expenses.csv', 'a', encoding='utf-8', newline='') as f:
+        f.write('2024-01-03,other,3.00,external\r\n')
+
+    reopened = ExpenseManager()
+    assert [e.description for e in reopened.expenses] == ['a', 'b', 'c', 'journaled', 'external']
+    assert reopened.delete_expense(3)
+    reopened.close()
+
+    final = ExpenseManager()
+    assert [e.description for e in final.expenses] == ['a', 'b', 'c', 'external']
+    final.close()
@@ -0,0 +1,20 @@
+"""Tests for the low-level ledger file routines."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'expense_tracker'))
+
+from storage import append_rows, read_footer_checksum, read_ledger, write_atomic  # noqa: E402
+
+
+def test_footer_inside_quoted_description_is_ignored(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    lookalike = 'note\n#footer,1,' + '0' * 64
+    rows = [{'date': '2024-01-01', 'category': 'food', 'amount': '1.00', 'description': lookalike}]
+    checksum, _ = write_atomic(path, rows)
+    append_rows(path, [{'date': '2024-01-02', 'category': 'food', 'amount': '2.00', 'description': lookalike}])
+
+    loaded, loaded_checksum = read_ledger(path)
+    assert [row['description'] for row in loaded] == [lookalike, lookalike]
+    assert loaded_checksum == read_footer_checksum(path) == checksum